@@ -17,6 +17,8 @@ from sklearn.preprocessing import StandardScaler # Pour normaliser les données
 from sklearn.cluster import KMeans # Le cerveau de l'IA (Algorithme de regroupement)
 from sklearn.decomposition import PCA # Pour la visualisation 2D (Projection)
 import time # Pour créer des délais et simuler un chargement réaliste
+from export_segments import exporter_csv_compresse, exporter_parquet # Les exports rapides (CSV par blocs, Parquet)
+from base_segments import assigner_ids_clients, calculer_ids_clients, sauvegarder_base # La base indexée (SQLite)
 
 # --- FONCTION D'INTERFACE GRAPHIQUE (CONSOLE) ---
 # Cette fonction sert juste à faire joli dans la console (Titres encadrés)
@@ -57,6 +59,8 @@ except:
 
 # 2. Nettoyage des données (Data Cleaning)
 print("\n[ETL] Scan de l'intégrité des données...")
+# Identifiant client stable calculé sur les lignes BRUTES (avant de boucher les trous avec la moyenne)
+ids_clients = calculer_ids_clients(df)
 # On compte les cases vides
 nb_vides = df.isnull().sum().sum()
 
@@ -262,7 +266,12 @@ plt.ylabel("Dimension 2")
 plt.colorbar(sc, label="Segment")
 plt.show()
 # SAUVEGARDE FINALE
-df.to_csv('audience_architect_final_report.csv', index=False)
+# CSV écrit bloc par bloc + Parquet compressé, un dossier par Cluster (beaucoup plus léger et rapide à relire)
+df = assigner_ids_clients(df, ids=ids_clients) # Identifiant client stable (calculé sur la ligne brute, avant imputation)
+exporter_csv_compresse(df, 'audience_architect_final_report.csv', compression=None)
+exporter_parquet(df, 'audience_architect_final_report_parquet')
+# Base indexée : "membres du groupe 3 avec Fidélité < 40" en quelques millisecondes
+sauvegarder_base(df, 'audience_architect_segments.sqlite', colonnes_index=['Score_Fidelite', 'Panier_Moyen'])
 print("\n" + "═"*70)
-print(f"✅ TRAITEMENT TERMINÉ. Fichier exporté : 'audience_architect_final_report.csv'")
+print(f"✅ TRAITEMENT TERMINÉ. Fichiers exportés : 'audience_architect_final_report.csv' + 'audience_architect_final_report_parquet/' + 'audience_architect_segments.sqlite'")
 print("═"*70)
\ No newline at end of file
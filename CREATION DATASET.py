@@ -37,6 +37,9 @@ print_header("PHASE 1 : CONFIGURATION DU MOTEUR")
 NB_CLIENTS = 50000
 print(f"[CONFIG] Volume cible : {NB_CLIENTS:,} profils uniques.".replace(',', ' '))
 
+# Option : produire aussi les journaux bruts (commandes + sessions) de ces clients
+GENERER_JOURNAUX = False
+
 # Fixer la graine aléatoire (Seed)
 # Cela permet d'avoir toujours le même résultat à chaque lancement (Reproductibilité scientifique)
 np.random.seed(42)
@@ -151,4 +154,15 @@ print("═"*70)
 
 # Petit aperçu pour le jury
 print("\n--- APERÇU ÉCHANTILLON (5 PREMIÈRES LIGNES) ---")
-print(df.head().to_string())
\ No newline at end of file
+print(df.head().to_string())
+
+# =============================================================================
+# PHASE 4 (OPTIONNELLE) : JOURNAUX D'ÉVÉNEMENTS
+# =============================================================================
+if GENERER_JOURNAUX:
+    from simulation_evenements import simuler_journaux
+    print_header("PHASE 4 : JOURNAUX D'ÉVÉNEMENTS (COMMANDES + SESSIONS)")
+    print("[I/O] Écriture par blocs dans le dossier 'journaux_evenements'...")
+    compteurs = simuler_journaux('journaux_evenements', profils=df)
+    for table, nb in compteurs.items():
+        print(f"   ► {table} : {nb:,} lignes".replace(',', ' '))
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Mode "Budget Temps" (analyse adaptative).
+          L'utilisateur fixe un temps de réponse (ex : 5 secondes).
+          Un modèle de coût, mesuré sur la machine, prédit la durée de chaque
+          étape. On choisit alors la taille d'échantillon, le nombre
+          d'initialisations (n_init), la variante de K-Means et l'étendue du
+          balayage pour tenir le budget.
+          Les petits fichiers gardent le calcul exact d'origine ; les
+          approximations faites sont listées avec leur perte de précision estimée.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import time                      # Chronométrage (calibration et exécution)
+
+import numpy as np               # Moteur de calcul mathématique
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from balayage_bisectif import balayage_bisectif
+from noyau_segmentation import trouver_coude_automatique
+
+# Nombre moyen d'itérations d'un K-Means (hypothèse du modèle de coût)
+ITERATIONS_ESTIMEES = 30
+# En dessous de cette taille, un échantillon ne représente plus la base
+TAILLE_ECHANTILLON_MIN = 2000
+# Part du budget réservée au calcul (le reste couvre l'échantillonnage et l'estimation de précision)
+MARGE_BUDGET = 0.8
+# Taille de l'échantillon pilote qui sert à estimer la perte de précision
+TAILLE_PILOTE = 5000
+
+# Coûts unitaires mesurés sur cette machine (calculés une seule fois)
+_CALIBRATION = None
+
+# ==============================================================================
+# 2. LA CALIBRATION (MESURE DE LA VITESSE DE LA MACHINE)
+# ==============================================================================
+
+def _chronometrer(modele, X):
+    """Durée d'un entraînement (meilleure de 2 mesures, pour écarter les à-coups de la machine)."""
+    durees = []
+    for _ in range(2):
+        debut = time.perf_counter()
+        modele.fit(X)
+        durees.append(time.perf_counter() - debut)
+    return min(durees), modele
+
+
+def calibrer(taille=50000, d=4, k=6, random_state=0):
+    """
+    Chronomètre quelques petits K-Means sur deux tailles de données pour connaître, sur cette machine :
+      - le coût d'une opération élémentaire (une distance client-centre, pour une itération),
+      - les frais fixes de chaque entraînement (préparation, threads...).
+    Le résultat est gardé en mémoire : la calibration ne coûte qu'une fois (moins d'une seconde).
+    """
+    global _CALIBRATION
+    if _CALIBRATION is not None:
+        return _CALIBRATION
+
+    X = np.random.default_rng(random_state).normal(size=(taille, d))
+    petit = X[:taille // 5]
+    calibration = {}
+
+    # Échauffement : le tout premier entraînement paie des frais de démarrage uniques
+    KMeans(n_clusters=k, n_init=1, max_iter=2, random_state=random_state).fit(petit)
+
+    # Droite durée = frais fixes + coût unitaire x (lignes x colonnes x groupes x itérations)
+    for algorithme in ('lloyd', 'elkan'):
+        mesures = []
+        for donnees in (petit, X):
+            duree, km = _chronometrer(KMeans(n_clusters=k, n_init=1, max_iter=20, tol=0, algorithm=algorithme,
+                                             random_state=random_state), donnees)
+            mesures.append((len(donnees) * d * k * km.n_iter_, duree))
+        (u1, t1), (u2, t2) = mesures
+        calibration[algorithme] = max((t2 - t1) / (u2 - u1), t2 / u2 / 10)
+        calibration.setdefault('frais_fixes_s', max(t1 - calibration[algorithme] * u1, 0.0))
+
+    # Affectation finale de toute la base (une seule passe de distances)
+    debut = time.perf_counter()
+    km.predict(X)
+    calibration['affectation'] = (time.perf_counter() - debut) / (taille * d * k)
+
+    _CALIBRATION = calibration
+    return calibration
+
+
+# ==============================================================================
+# 3. LE MODÈLE DE COÛT
+# ==============================================================================
+
+def cout_ajustement(calibration, n, d, k, n_init, algorithme):
+    """Durée prédite (secondes) d'un entraînement K-Means."""
+    return n_init * (calibration['frais_fixes_s'] + calibration[algorithme] * n * d * k * ITERATIONS_ESTIMEES)
+
+
+def cout_plan(calibration, plan, n, d):
+    """Durée prédite d'un plan complet : balayage + modèle final + affectation de toute la base."""
+    m = plan['n_echantillon']
+    ks = range(1, plan['k_max'] + 1)
+    if plan['balayage'] == 'bisectif':
+        # Un arbre : environ un 2-Means par étage + quelques pas d'affinage
+        balayage = sum(cout_ajustement(calibration, m, d, 2, 3, 'lloyd') / 2 + cout_ajustement(calibration, m, d, k, 1, 'lloyd') / 10
+                       for k in ks)
+    else:
+        balayage = sum(cout_ajustement(calibration, m, d, k, plan['n_init'], plan['algorithme']) for k in ks)
+    # Le k final n'est pas connu d'avance : on prend le pire cas (k_max)
+    final = cout_ajustement(calibration, m, d, plan['k_max'], plan['n_init'], plan['algorithme'])
+    affectation = calibration['affectation'] * n * d * plan['k_max'] if m < n else 0.0
+    return balayage + final + affectation
+
+# ==============================================================================
+# 4. LE CHOIX DU PLAN
+# ==============================================================================
+
+def choisir_plan(n, d, budget_s, k_max=9, calibration=None):
+    """
+    Descend l'échelle des approximations jusqu'à trouver un plan qui tient dans le budget :
+      1. calcul exact d'origine (n_init=10, balayage complet, toutes les lignes)
+      2. moins d'initialisations (n_init=3)
+      3. balayage bisectif (un seul arbre au lieu de 9 K-Means)
+      4. échantillon (le plus grand possible) + affectation de toute la base
+      5. balayage raccourci (k_max réduit)
+    """
+    calibration = calibration or calibrer()
+    limite = budget_s * MARGE_BUDGET
+    exact = {'n_echantillon': n, 'n_init': 10, 'algorithme': 'lloyd', 'balayage': 'exact', 'k_max': k_max}
+
+    # La variante exacte la plus rapide sur cette machine (Lloyd ou Elkan)
+    plus_rapide = min(('lloyd', 'elkan'), key=lambda a: calibration[a])
+
+    echelle = [
+        dict(exact),
+        dict(exact, n_init=3, algorithme=plus_rapide),
+        dict(exact, n_init=3, algorithme=plus_rapide, balayage='bisectif'),
+    ]
+    for plan in echelle:
+        if cout_plan(calibration, plan, n, d) <= limite:
+            return _decrire(plan, n, k_max, cout_plan(calibration, plan, n, d), budget_s)
+
+    # Échantillonnage : on cherche le plus grand échantillon qui tient (recherche par dichotomie)
+    for k_reduit in (k_max, max(4, k_max - 3)):
+        base = dict(exact, n_init=3, algorithme=plus_rapide, balayage='bisectif', k_max=k_reduit)
+        bas, haut = TAILLE_ECHANTILLON_MIN, n
+        if cout_plan(calibration, dict(base, n_echantillon=bas), n, d) > limite:
+            continue
+        while haut - bas > max(500, bas // 50):
+            milieu = (bas + haut) // 2
+            if cout_plan(calibration, dict(base, n_echantillon=milieu), n, d) <= limite:
+                bas = milieu
+            else:
+                haut = milieu
+        plan = dict(base, n_echantillon=bas)
+        return _decrire(plan, n, k_max, cout_plan(calibration, plan, n, d), budget_s)
+
+    # Même le plus petit plan dépasse : on le lance quand même (meilleur effort)
+    plan = dict(exact, n_echantillon=min(n, TAILLE_ECHANTILLON_MIN), n_init=1, algorithme=plus_rapide,
+                balayage='bisectif', k_max=max(4, k_max - 3))
+    return _decrire(plan, n, k_max, cout_plan(calibration, plan, n, d), budget_s)
+
+
+def _decrire(plan, n, k_max, cout_s, budget_s):
+    """Ajoute au plan la liste lisible des approximations faites."""
+    approximations = []
+    if plan['n_init'] < 10:
+        approximations.append(f"{plan['n_init']} initialisation(s) au lieu de 10")
+    if plan['algorithme'] != 'lloyd':
+        approximations.append(f"variante '{plan['algorithme']}' (même résultat, calcul plus rapide)")
+    if plan['balayage'] == 'bisectif':
+        approximations.append("balayage bisectif (un seul arbre) au lieu de 9 K-Means")
+    if plan['n_echantillon'] < n:
+        approximations.append(f"modèle appris sur {plan['n_echantillon']:,} clients sur {n:,}".replace(',', ' ')
+                              + ", puis appliqué à toute la base")
+    if plan['k_max'] < k_max:
+        approximations.append(f"balayage limité à k = 1...{plan['k_max']}")
+    return dict(plan, approximations=approximations, exact=not approximations,
+                cout_estime_s=cout_s, budget_s=budget_s, depassement=cout_s > budget_s)
+
+# ==============================================================================
+# 5. L'EXÉCUTION DU PLAN
+# ==============================================================================
+
+def _modele(k, plan, random_state):
+    return KMeans(n_clusters=k, n_init=plan['n_init'], algorithm=plan['algorithme'],
+                  random_state=random_state)
+
+
+def estimer_perte_precision(X, plan, k, random_state=42):
+    """
+    Sur un petit échantillon pilote, compare le modèle approché (mêmes réglages, même
+    proportion de lignes) au modèle exact : écart d'inertie et accord des groupes (ARI).
+    """
+    rng = np.random.default_rng(random_state)
+    pilote = X[rng.choice(len(X), size=min(len(X), TAILLE_PILOTE), replace=False)]
+
+    exact = KMeans(n_clusters=k, n_init=10, random_state=random_state).fit(pilote)
+    proportion = plan['n_echantillon'] / len(X)
+    taille = min(len(pilote), max(k * 50, int(len(pilote) * proportion)))
+    sous_pilote = pilote[rng.choice(len(pilote), size=taille, replace=False)]
+    approche = _modele(k, plan, random_state).fit(sous_pilote)
+
+    labels = approche.predict(pilote)
+    inertie_approchee = ((pilote - approche.cluster_centers_[labels]) ** 2).sum()
+    return {
+        'perte_inertie_pct': 100 * (inertie_approchee - exact.inertia_) / exact.inertia_,
+        'accord_ari': adjusted_rand_score(exact.labels_, labels),
+    }
+
+
+def analyser_avec_budget(df_scaled, budget_s, k_max=9, random_state=42):
+    """
+    Analyse complète dans le budget : calibration, choix du plan, balayage, coude, modèle final, affectation.
+    Retourne (optimal_k, inertie, k_range, labels, kmeans, rapport).
+    'rapport' contient le plan, les approximations, la durée réelle et la perte de précision estimée.
+    """
+    debut = time.perf_counter()
+    # La calibration (environ 1 s la première fois) est prise sur le budget : le plan n'a que le temps qui reste
+    calibration = calibrer()
+    X = np.asarray(df_scaled, dtype=float)
+    n, d = X.shape
+    plan = choisir_plan(n, d, max(budget_s - (time.perf_counter() - debut), 0.0), k_max, calibration)
+
+    # Échantillon d'apprentissage (toute la base si le plan le permet)
+    rng = np.random.default_rng(random_state)
+    X_appr = X if plan['n_echantillon'] >= n else X[rng.choice(n, size=plan['n_echantillon'], replace=False)]
+
+    # Balayage des k
+    if plan['balayage'] == 'bisectif':
+        inertie, k_range, _ = balayage_bisectif(X_appr, k_max=plan['k_max'], random_state=random_state)
+    else:
+        k_range = range(1, plan['k_max'] + 1)
+        inertie = [_modele(k, plan, random_state).fit(X_appr).inertia_ for k in k_range]
+    optimal_k = trouver_coude_automatique(inertie)
+
+    # Modèle final, puis affectation de chaque client de la base
+    kmeans = _modele(optimal_k, plan, random_state).fit(X_appr)
+    labels = kmeans.labels_ if X_appr is X else kmeans.predict(X)
+
+    rapport = dict(plan, temps_reel_s=time.perf_counter() - debut)
+    if not plan['exact']:
+        rapport.update(estimer_perte_precision(X, plan, optimal_k, random_state))
+    rapport['temps_total_s'] = time.perf_counter() - debut
+    return optimal_k, inertie, k_range, labels, kmeans, rapport
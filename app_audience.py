@@ -15,6 +15,16 @@ from math import pi             # Le nombre Pi (3.14...) nécessaire pour dessin
 import time                     # L'outil pour gérer le temps (pauses, animations)
 from fpdf import FPDF           # L'outil spécial pour créer des fichiers PDF
 import tempfile                 # L'outil pour créer des fichiers temporaires (qui s'effacent après)
+from pathlib import Path        # L'outil pour lire un fichier d'un coup
+import os                       # L'outil pour fermer le fichier temporaire
+from stabilite_segments import analyser_stabilite # L'outil qui vérifie que les groupes ne sont pas un hasard
+from balayage_bisectif import balayage_bisectif   # Le balayage rapide (un seul arbre de découpage)
+from noyau_segmentation import trouver_coude_automatique, generer_description # Le coude et le nom des groupes
+from export_segments import flux_csv, flux_zip_segments, parquet_en_memoire # Les exports rapides
+from service_segments import modele_en_json # La sauvegarde du modèle pour le service temps réel
+from analyse_budget import analyser_avec_budget # Le mode "Budget Temps" (analyse adaptative)
+from base_segments import assigner_ids_clients, calculer_ids_clients, BaseDifferee, rechercher, compter # La base indexée (SQLite)
+from micro_segments import KMeansHamerly, recherche_grossiere_fine, CLIENTS_MIN_PAR_SEGMENT # Le mode micro-segments (100 à 500 groupes)
 
 # ==============================================================================
 # 2. CONFIGURATION DE LA PAGE WEB
@@ -22,6 +32,22 @@ import tempfile                 # L'outil pour créer des fichiers temporaires (
 # On dit à l'application de s'ouvrir en grand (mode 'wide') et on met un titre dans l'onglet du navigateur
 st.set_page_config(page_title="Audience Architect", page_icon="🎯", layout="wide")
 
+# Réglages du test de stabilité (Bootstrap)
+# Le budget limite le temps passé (valeur par défaut, réglable dans la barre latérale),
+# la taille max borne chaque tirage (même avec des millions de lignes)
+STABILITE_NB_TIRAGES = 30
+STABILITE_BUDGET_S = 20
+STABILITE_TAILLE_MAX = 20000
+
+# Mode Budget Temps : part du budget gardée pour l'affichage des résultats (graphiques, tableaux)
+RESERVE_AFFICHAGE_S = 1.5
+
+# Affichage quand il y a beaucoup de groupes (mode micro-segments)
+PALETTE_GROUPES = ['#1E88E5', '#43A047', '#FDD835', '#E53935', '#8E24AA'] # Palette de couleurs pro
+GROUPES_PAR_PAGE = 10   # Nombre de fiches PERSONAS affichées par page
+GROUPES_GRAPHIQUES = 8  # Au-delà, les graphiques montrent les plus gros groupes (+ "Autres")
+PDF_MAX_FICHES = 20     # Au-delà, le PDF détaille les plus gros groupes et renvoie au CSV pour les autres
+
 # ==============================================================================
 # 3. LE DESIGN (LE MAQUILLAGE CSS)
 # ==============================================================================
@@ -112,10 +138,24 @@ class ExpertPDF(FPDF):
 # 5. LES FONCTIONS INTELLIGENTES (LES MINI-PROGRAMMES)
 # ==============================================================================
 
+def couleurs_groupes(n):
+    """
+    n couleurs toutes différentes : la palette maison jusqu'à 5 groupes,
+    puis une palette de 20 teintes (au-delà, les graphiques regroupent les petits groupes).
+    """
+    if n <= len(PALETTE_GROUPES):
+        return PALETTE_GROUPES[:n]
+    return [plt.cm.tab20(i % 20) for i in range(n)]
+
+def plus_gros_groupes(df_clean, nombre):
+    """Les numéros des 'nombre' groupes les plus peuplés (du plus gros au plus petit)."""
+    return df_clean['Cluster'].value_counts().index[:nombre].tolist()
+
 def create_radar_chart(df_clean, optimal_k):
     """
     Cette fonction dessine le graphique en toile d'araignée.
     Elle compare l'Âge, la Fidélité, le Panier et la Promo.
+    Avec beaucoup de groupes, seuls les plus gros sont dessinés (sinon le dessin est illisible).
     """
     # On choisit les colonnes à dessiner (PAS de revenu ici)
     categories = ['Age', 'Score_Fidelite', 'Panier_Moyen', 'Sensibilite_Promo']
@@ -135,16 +175,17 @@ def create_radar_chart(df_clean, optimal_k):
     
     # Création du dessin
     fig, ax = plt.subplots(figsize=(6, 6), subplot_kw=dict(polar=True))
-    colors = ['#1E88E5', '#43A047', '#FDD835', '#E53935', '#8E24AA'] # Palette de couleurs pro
+    groupes = sorted(plus_gros_groupes(df_clean, GROUPES_GRAPHIQUES)) if optimal_k > GROUPES_GRAPHIQUES else range(optimal_k)
+    colors = couleurs_groupes(len(groupes))
     
     # On dessine chaque groupe un par un
-    for i in range(optimal_k):
+    for couleur, i in zip(colors, groupes):
         values = radar_scaled.iloc[i].values.flatten().tolist()
         values += values[:1] # On ferme la ligne
         # On trace le trait
-        ax.plot(angles, values, linewidth=2, linestyle='solid', label=f"Groupe {i+1}", color=colors[i % len(colors)])
+        ax.plot(angles, values, linewidth=2, linestyle='solid', label=f"Groupe {i+1}", color=couleur)
         # On colorie l'intérieur (transparence alpha=0.1)
-        ax.fill(angles, values, color=colors[i % len(colors)], alpha=0.1)
+        ax.fill(angles, values, color=couleur, alpha=0.1)
     
     # On ajoute les étiquettes (Age, Promo...) autour du cercle
     plt.xticks(angles[:-1], categories_labels, color='grey', size=9)
@@ -152,6 +193,8 @@ def create_radar_chart(df_clean, optimal_k):
     # On enlève les chiffres moches sur les axes
     plt.yticks([-1, 0, 1, 2], ["-", "Moy", "+", "++"], color="grey", size=7)
     plt.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1), fontsize=8)
+    if optimal_k > GROUPES_GRAPHIQUES:
+        plt.title(f"Les {GROUPES_GRAPHIQUES} plus gros groupes (sur {optimal_k})", size=9, color='grey')
     return fig
 
 def create_bubble_chart(df_clean):
@@ -187,7 +230,8 @@ def create_elbow_chart(k_range, inertie, optimal_k):
     fig, ax = plt.subplots(figsize=(8, 4))
     plt.plot(k_range, inertie, color='#1565C0', marker='o', linestyle='--')
     # On dessine un gros point rouge sur le choix de l'IA
-    plt.plot(optimal_k, inertie[optimal_k-1], 'o', color='#D32F2F', markersize=12, label='Point Optimal (Coude)')
+    # (en mode micro-segments, les k testés ne sont pas 1, 2, 3... : on cherche la bonne position)
+    plt.plot(optimal_k, inertie[list(k_range).index(optimal_k)], 'o', color='#D32F2F', markersize=12, label='Point Optimal (Coude)')
     plt.xlabel('Nombre de Groupes')
     plt.ylabel('Inertie (Variance)')
     plt.title(f'Detection Algorithmique : {optimal_k} Groupes')
@@ -195,55 +239,30 @@ def create_elbow_chart(k_range, inertie, optimal_k):
     plt.grid(True, alpha=0.3)
     return fig
 
-def trouver_nombre_ideal(df_scaled):
+def trouver_nombre_ideal(df_scaled, mode="exact", plage_micro=(100, 300)):
     """
     C'est ici que la magie opère ! 
     L'algorithme teste de 1 à 9 groupes et calcule l'erreur (inertie) à chaque fois.
     Ensuite, il utilise la géométrie pour trouver la "cassure" de la courbe (le coude).
+    En mode "bisectif", un seul arbre de découpage donne toute la courbe d'un coup.
+    En mode "micro", on cherche dans plage_micro (ex : 100 à 300 groupes), grille grossière puis fine.
     """
-    inertie = []
-    k_range = range(1, 10)
-    for k in k_range:
-        km = KMeans(n_clusters=k, random_state=42, n_init=10) # On initialise l'IA
-        km.fit(df_scaled) # On l'entraîne
-        inertie.append(km.inertia_) # On mesure l'erreur
-    
-    # Calcul géométrique de la distance point-droite pour trouver le coude parfait
-    p1 = np.array([1, inertie[0]])
-    p2 = np.array([len(inertie), inertie[-1]])
-    distances = []
-    for i in range(len(inertie)):
-        p0 = np.array([i+1, inertie[i]])
-        dist = np.abs(np.cross(p2-p1, p1-p0)) / np.linalg.norm(p2-p1)
-        distances.append(dist)
+    if mode == "micro":
+        return recherche_grossiere_fine(df_scaled, k_min=plage_micro[0], k_max=plage_micro[1])
+    if mode == "bisectif":
+        inertie, k_range, _ = balayage_bisectif(df_scaled, k_max=9)
+    else:
+        inertie = []
+        k_range = range(1, 10)
+        for k in k_range:
+            km = KMeans(n_clusters=k, random_state=42, n_init=10) # On initialise l'IA
+            km.fit(df_scaled) # On l'entraîne
+            inertie.append(km.inertia_) # On mesure l'erreur
     
     # On retourne le nombre de groupes qui a la plus grande distance (le coude)
-    return distances.index(max(distances)) + 1, inertie, k_range
-
-def generer_description(stats, global_stats):
-    """
-    Cette fonction donne un nom intelligent au groupe sans parler de revenu.
-    Elle compare les stats du groupe avec la moyenne globale.
-    """
-    tags = []
-    
-    # Règle 1 : Âge
-    if stats['Age'] < global_stats['Age'] - 5: tags.append("GEN Z")
-    elif stats['Age'] > global_stats['Age'] + 5: tags.append("SENIOR")
-    
-    # Règle 2 : Panier Moyen 
-    if stats['Panier_Moyen'] > global_stats['Panier_Moyen'] * 1.2: tags.append("HIGH SPENDER") # Dépense beaucoup
-    elif stats['Panier_Moyen'] < global_stats['Panier_Moyen'] * 0.8: tags.append("PETIT PANIER") # Dépense peu
-    
-    # Règle 3 : Comportement
-    if stats['Sensibilite_Promo'] > 0.5: tags.append("CHASSEUR PROMO")
-    if stats['Score_Fidelite'] > 70: tags.append("FAN")
-    if stats['Score_Fidelite'] < 40: tags.append("VOLATILE") # Infidèle
-    
-    # Si on ne trouve rien de spécial, on l'appelle "Standard"
-    return " / ".join(tags) if tags else "CLIENT STANDARD"
+    return trouver_coude_automatique(inertie), inertie, k_range
 
-def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow, fig_bubble, fig_radar):
+def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow, fig_bubble, fig_radar, stabilite=None):
     """
     Cette fonction fabrique le fichier PDF complet page par page.
     """
@@ -268,6 +287,10 @@ def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow,
     pdf.chapter_title("1. Methodologie & Detection des Groupes")
     pdf.chapter_body(f"Nous avons utilise l'algorithme K-Means pour segmenter votre base. La methode du 'Coude' ci-dessous a permis de determiner scientifiquement le nombre ideal de segments.")
     pdf.chapter_body(f"RESULTAT : L'analyse detecte {optimal_k} groupes homogenes distincts.")
+    if stabilite is not None and stabilite['score'] is None:
+        pdf.chapter_body("STABILITE : non mesuree (aucun re-echantillonnage n'a tenu dans le budget de temps).")
+    elif stabilite is not None:
+        pdf.chapter_body(f"STABILITE : Jaccard moyen de {stabilite['score']:.2f} sur {stabilite['n_tirages']} re-echantillonnages (Bootstrap), soit {stabilite['interpretation']}. Plus le score est proche de 1, plus les groupes sont robustes.")
     
     # On colle l'image de la courbe Elbow
     with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_elbow:
@@ -291,7 +314,11 @@ def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow,
     pdf.chapter_title("3. Fiches Detailles & Plans d'Action")
     
     # On boucle sur chaque groupe pour écrire ses détails
-    for i in range(optimal_k):
+    # (micro-segments : seulement les plus gros, les autres sont dans le CSV complet)
+    groupes = plus_gros_groupes(df_clean, PDF_MAX_FICHES) if optimal_k > PDF_MAX_FICHES else range(optimal_k)
+    if optimal_k > PDF_MAX_FICHES:
+        pdf.chapter_body(f"Les {PDF_MAX_FICHES} groupes les plus importants sont detailles ci-dessous. Les {optimal_k - PDF_MAX_FICHES} autres figurent dans le fichier CSV complet (colonne Cluster).")
+    for i in groupes:
         p = profils.iloc[i]
         nom = generer_description(p, stats_globales)
         pop = len(df_clean[df_clean['Cluster']==i])
@@ -307,6 +334,8 @@ def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow,
         # On affiche le Panier au lieu du Revenu
         pdf.cell(0, 7, f"   - Profil : {int(p['Age'])} ans | Panier : {int(p['Panier_Moyen'])} Dhs", 0, 1)
         pdf.cell(0, 7, f"   - Fidelite : {int(p['Score_Fidelite'])}/100", 0, 1)
+        if stabilite is not None and stabilite['score'] is not None:
+            pdf.cell(0, 7, f"   - Stabilite : {stabilite['segments']['jaccard_moyen'].iloc[i]:.2f}", 0, 1)
         
         # Logique de recommandation automatique
         if p['Score_Fidelite'] < 40: action = "URGENCE : Plan de retention + Coupon reactivation."
@@ -327,6 +356,10 @@ def generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow,
 # 6. LE CHEF D'ORCHESTRE (PROGRAMME PRINCIPAL)
 # ==============================================================================
 
+# Mode Budget Temps : le chronomètre part au début de l'exécution qui suit le dépôt du fichier
+# (lecture, calcul et affichage : toute la chaîne compte)
+debut_execution = time.perf_counter()
+
 # Affichage du Logo et du Titre
 c_h1, c_h2 = st.columns([0.5, 5])
 with c_h1: st.image("https://cdn-icons-png.flaticon.com/512/2814/2814666.png", width=90)
@@ -338,12 +371,34 @@ st.markdown("---")
 # Zone de dépôt de fichier
 uploaded_file = st.file_uploader("📂 Importez votre fichier CSV", type=["csv"])
 
+# Choix du mode de balayage (Exact = 9 K-Means complets, Rapide = un seul arbre bisectif)
+MODES_BALAYAGE = {"exact": "Exact (K-Means complet)", "bisectif": "Rapide (Bisectif)", "micro": "Micro-segments (100+ groupes)"}
+mode_balayage = st.sidebar.radio("Mode de détection des groupes", list(MODES_BALAYAGE), format_func=MODES_BALAYAGE.get)
+# Micro-segments : le nombre de groupes est cherché dans cette plage
+plage_micro = st.sidebar.slider("Plage de micro-segments", 20, 500, (100, 300), step=10) if mode_balayage == "micro" else None
+
+# Mode "Budget Temps" : l'IA adapte ses calculs pour répondre dans le temps demandé
+mode_budget = st.sidebar.toggle("⏱️ Mode Budget Temps")
+budget_s = st.sidebar.number_input("Temps de réponse visé (secondes)", min_value=1, max_value=600, value=5) if mode_budget else None
+if budget_s and mode_balayage == "micro":
+    st.sidebar.warning("⏱️ Le Mode Budget Temps est prioritaire : les micro-segments sont ignorés (9 groupes au plus).")
+# Temps accordé au test de stabilité (0 = pas de test). En Mode Budget Temps, il est en plus limité au temps restant.
+budget_stabilite_s = st.sidebar.number_input("Budget du test de stabilité (secondes, 0 = aucun test)",
+                                             min_value=0, max_value=600, value=STABILITE_BUDGET_S)
+
 # SI UN FICHIER EST DÉPOSÉ
 if uploaded_file is not None:
     
     # GESTION DE MÉMOIRE (SESSION STATE)
     # C'est l'astuce pour que l'app ne recommence pas à zéro quand on clique sur un bouton
-    if 'data_analyzed' not in st.session_state or st.session_state.uploaded_file_name != uploaded_file.name:
+    if ('data_analyzed' not in st.session_state or st.session_state.uploaded_file_name != uploaded_file.name
+            or st.session_state.mode_balayage != mode_balayage or st.session_state.budget_s != budget_s
+            or st.session_state.plage_micro != plage_micro
+            or st.session_state.budget_stabilite_s != budget_stabilite_s):
+        
+        # En mode Budget Temps, chaque seconde compte : on supprime les pauses d'animation
+        debut_analyse = debut_execution
+        pause = (lambda secondes: None) if budget_s else time.sleep
         
         # === 1. ANIMATION DE DÉMARRAGE (Une seule fois) ===
         status = st.empty()
@@ -351,9 +406,11 @@ if uploaded_file is not None:
         
         status.markdown('<div class="console-box">> SYSTEM: Initialisation Core IA...</div>', unsafe_allow_html=True)
         bar.progress(10)
-        time.sleep(3.5)
+        pause(3.5)
         
         df = pd.read_csv(uploaded_file)
+        # Identifiants calculés AVANT l'imputation : une case vide ne doit pas dépendre des autres clients
+        ids_clients = calculer_ids_clients(df)
         
         # NETTOYAGE
         df_clean = df.fillna(df.mean())
@@ -362,7 +419,7 @@ if uploaded_file is not None:
         # On utilise Age, Fidelite, Panier, Promo (On exclut le revenu pour le calcul)
         features_cols = ['Age', 'Score_Fidelite', 'Panier_Moyen', 'Sensibilite_Promo']
         bar.progress(10)
-        time.sleep(2.5)
+        pause(2.5)
         # Vérification de sécurité : si les colonnes existent, on les prend, sinon on prend tout
         if set(features_cols).issubset(df_clean.columns):
             X = df_clean[features_cols]
@@ -375,16 +432,58 @@ if uploaded_file is not None:
         
         status.markdown('<div class="console-box">> [AI] Recherche du nombre optimal de groupes...<br>> Exécution algorithme K-Means (Elbow Method)..</div>', unsafe_allow_html=True)
         bar.progress(60)
-        time.sleep(1)
+        pause(1)
         
+        # QUEL MODE S'APPLIQUE ? (le Budget Temps l'emporte ; une trop petite base n'a pas de micro-segments)
+        mode_calcul, avis_mode = mode_balayage, None
+        if mode_balayage == "micro":
+            nb_max_micro = len(df_scaled) // CLIENTS_MIN_PAR_SEGMENT
+            if budget_s:
+                avis_mode = "Mode Budget Temps prioritaire : les micro-segments ont été ignorés."
+            elif nb_max_micro < 2:
+                mode_calcul = "exact"
+                avis_mode = f"Base trop petite pour des micro-segments ({len(df_scaled)} clients) : détection classique utilisée."
+            elif nb_max_micro < plage_micro[1]:
+                avis_mode = f"Base de {len(df_scaled)} clients : {nb_max_micro} micro-segments au plus ({CLIENTS_MIN_PAR_SEGMENT} clients minimum par groupe)."
+        micro_actif = mode_calcul == "micro" and not budget_s
+
         # CALCUL DES GROUPES
-        optimal_k, inertie, k_range = trouver_nombre_ideal(df_scaled)
-        kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
-        df_clean['Cluster'] = kmeans.fit_predict(df_scaled)
+        if budget_s:
+            # L'IA choisit elle-même ses raccourcis (échantillon, n_init, balayage) pour tenir le budget.
+            # Elle n'a que le temps qui reste après la lecture du fichier, moins la réserve pour l'affichage.
+            budget_calcul = max(budget_s - (time.perf_counter() - debut_analyse) - RESERVE_AFFICHAGE_S, 0)
+            optimal_k, inertie, k_range, labels, kmeans, rapport_budget = analyser_avec_budget(df_scaled, budget_calcul)
+            df_clean['Cluster'] = labels
+        else:
+            optimal_k, inertie, k_range = trouver_nombre_ideal(df_scaled, mode_calcul, plage_micro)
+            # Micro-segments : K-Means à bornes (évite la plupart des calculs de distances quand k est grand)
+            kmeans = KMeansHamerly(n_clusters=optimal_k, random_state=42) if micro_actif else KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
+            df_clean['Cluster'] = kmeans.fit_predict(df_scaled)
+            rapport_budget = None
+        
+        # TEST DE STABILITÉ : on ré-entraîne le modèle sur des tirages aléatoires
+        status.markdown('<div class="console-box">> [AI] Test de stabilité des segments (Bootstrap)...</div>', unsafe_allow_html=True)
+        bar.progress(80)
+        # En mode Budget Temps, le test est reporté : il sera lancé à la demande (bouton de la Vue Stratégique)
+        stabilite = analyser_stabilite(df_scaled, df_clean['Cluster'].to_numpy(), kmeans.cluster_centers_,
+                                       n_tirages=STABILITE_NB_TIRAGES, budget_s=0 if budget_s else budget_stabilite_s,
+                                       taille_max=STABILITE_TAILLE_MAX,
+                                       n_init=1 if micro_actif else 10)
+        stabilite_reportee = (df_scaled, df_clean['Cluster'].to_numpy(), kmeans.cluster_centers_) \
+            if budget_s and budget_stabilite_s else None
+        
+        # IDENTIFIANTS + BASE INDEXÉE : chaque client reçoit un id stable.
+        # La base SQLite n'est construite qu'au premier usage (recherche ou téléchargement), pas ici.
+        df_clean = assigner_ids_clients(df_clean, ids=ids_clients)
+        # Un seul fichier par session : une nouvelle analyse écrase l'ancien (pas de fichiers oubliés dans /tmp)
+        if 'chemin_base' not in st.session_state:
+            fichier, st.session_state.chemin_base = tempfile.mkstemp(suffix=".sqlite")
+            os.close(fichier)
+        st.session_state.base_indexee = BaseDifferee(df_clean, st.session_state.chemin_base)
         
         status.markdown(f'<div class="console-box">> SUCCESS: {optimal_k} Segments détectés.</div>', unsafe_allow_html=True)
         bar.progress(100)
-        time.sleep(2.5)
+        pause(2.5)
         status.empty() # On efface les messages
         bar.empty()
         
@@ -393,7 +492,19 @@ if uploaded_file is not None:
         st.session_state.optimal_k = optimal_k
         st.session_state.inertie = inertie
         st.session_state.k_range = k_range
+        st.session_state.stabilite = stabilite
+        st.session_state.stabilite_reportee = stabilite_reportee
+        st.session_state.rapport_budget = rapport_budget
+        st.session_state.duree_totale_s = None # Mesurée à la fin de cette exécution (après l'affichage)
+        st.session_state.avis_mode = avis_mode
+        # Le modèle (scaler + centres) pour l'affectation en temps réel des nouveaux clients
+        st.session_state.modele = {'colonnes': list(X.columns), 'moyenne': scaler.mean_,
+                                   'echelle': scaler.scale_, 'centres': kmeans.cluster_centers_}
         st.session_state.uploaded_file_name = uploaded_file.name
+        st.session_state.mode_balayage = mode_balayage
+        st.session_state.budget_s = budget_s
+        st.session_state.plage_micro = plage_micro
+        st.session_state.budget_stabilite_s = budget_stabilite_s
         st.session_state.data_analyzed = True
 
     # === 2. AFFICHAGE DES RÉSULTATS (Immédiat) ===
@@ -402,22 +513,36 @@ if uploaded_file is not None:
     optimal_k = st.session_state.optimal_k
     inertie = st.session_state.inertie
     k_range = st.session_state.k_range
+    stabilite = st.session_state.stabilite
+    modele = st.session_state.modele
+    rapport_budget = st.session_state.rapport_budget
+    avis_mode = st.session_state.avis_mode
+    stabilite_reportee = st.session_state.stabilite_reportee
+    base_indexee = st.session_state.base_indexee
 
     st.success(f"✅ Analyse Terminée : {optimal_k} Groupes Stratégiques Identifiés.")
     
     # --- LES CHIFFRES CLÉS (KPI) ---
-    k1, k2, k3 = st.columns(3) 
+    k1, k2, k3, k4 = st.columns(4) 
+    # Stabilité non mesurée (budget de temps épuisé) : on n'affiche pas de chiffre
+    score_stabilite = "—" if stabilite['score'] is None else f"{stabilite['score']:.2f}"
     with k1: st.markdown(f"""<div class="metric-card"><div class="metric-value">{len(df_clean):,}</div><div class="metric-label">Base Clients</div></div>""", unsafe_allow_html=True)
     with k2: st.markdown(f"""<div class="metric-card"><div class="metric-value">{optimal_k}</div><div class="metric-label">Segments Clés</div></div>""", unsafe_allow_html=True)
     with k3: st.markdown(f"""<div class="metric-card"><div class="metric-value">{int(df_clean['Panier_Moyen'].mean())} Dhs</div><div class="metric-label">Panier Moyen Global</div></div>""", unsafe_allow_html=True)
+    with k4: st.markdown(f"""<div class="metric-card"><div class="metric-value">{score_stabilite}</div><div class="metric-label">Stabilité ({stabilite['interpretation']})</div></div>""", unsafe_allow_html=True)
     
     st.markdown("<br>", unsafe_allow_html=True)
 
     # CRÉATION DES GRAPHIQUES (Pour l'écran et le PDF)
     # 1. Camembert
     fig_pie, ax = plt.subplots(figsize=(5,5))
-    colors = ['#1E88E5', '#43A047', '#FDD835', '#E53935', '#8E24AA']
-    plt.pie(df_clean['Cluster'].value_counts(), labels=[f"Grp {i+1}" for i in range(optimal_k)], autopct='%1.1f%%', colors=colors, wedgeprops={'edgecolor':'white'})
+    effectifs = df_clean['Cluster'].value_counts()
+    # Beaucoup de groupes : les plus gros + une part "Autres" (sinon des centaines de parts illisibles)
+    if optimal_k > GROUPES_GRAPHIQUES:
+        effectifs = pd.concat([effectifs.iloc[:GROUPES_GRAPHIQUES - 1],
+                               pd.Series({f"Autres ({optimal_k - GROUPES_GRAPHIQUES + 1})": effectifs.iloc[GROUPES_GRAPHIQUES - 1:].sum()})])
+    etiquettes = [f"Grp {i+1}" if isinstance(i, (int, np.integer)) else i for i in effectifs.index]
+    plt.pie(effectifs, labels=etiquettes, autopct='%1.1f%%', colors=couleurs_groupes(len(effectifs)), wedgeprops={'edgecolor':'white'})
     
     # 2. Autres graphiques
     fig_radar = create_radar_chart(df_clean, optimal_k)
@@ -437,12 +562,44 @@ if uploaded_file is not None:
             st.subheader("Justification IA (Coude)")
             st.pyplot(fig_elbow)
             st.caption(f"L'algorithme a détecté une cassure optimale à {optimal_k} groupes.")
+            if stabilite_reportee is not None:
+                st.caption(f"Stabilité non mesurée : test reporté pour tenir le Budget Temps ({budget_stabilite_s}s au plus).")
+                if st.button("🔁 Mesurer la stabilité maintenant"):
+                    with st.spinner("Test de stabilité (Bootstrap)..."):
+                        st.session_state.stabilite = analyser_stabilite(*stabilite_reportee, n_tirages=STABILITE_NB_TIRAGES,
+                                                                        budget_s=budget_stabilite_s,
+                                                                        taille_max=STABILITE_TAILLE_MAX, n_init=10)
+                    st.session_state.stabilite_reportee = None
+                    st.rerun()
+            elif stabilite['score'] is None:
+                st.caption("Stabilité non mesurée : aucun tirage Bootstrap n'a tenu dans le budget de temps.")
+            else:
+                st.caption(f"Stabilité vérifiée sur {stabilite['n_tirages']} tirages Bootstrap : Jaccard moyen {stabilite['score']:.2f} ({stabilite['interpretation']}), ARI {stabilite['ari_moyen']:.2f}.")
+            if avis_mode is not None:
+                st.warning(f"ℹ️ {avis_mode}")
+            # Compte-rendu du mode Budget Temps (rempli à la toute fin, une fois l'affichage terminé)
+            zone_budget = st.empty()
 
     # Onglet 2 : Détails des groupes
     with tab2:
         profils = df_clean.groupby('Cluster').mean()
         stats_globales = df_clean.mean()
-        for i in range(optimal_k):
+        groupes = range(optimal_k)
+        if optimal_k > GROUPES_PAR_PAGE:
+            # Micro-segments : une vue d'ensemble (un tableau, une ligne par famille de profils)
+            # puis les fiches page par page, des plus gros groupes aux plus petits
+            synthese = pd.DataFrame({
+                'Profil': [generer_description(profils.iloc[i], stats_globales) for i in range(optimal_k)],
+                'Clients': df_clean['Cluster'].value_counts().sort_index().to_numpy(),
+            })
+            familles = synthese.groupby('Profil').agg(Groupes=('Clients', 'size'), Clients=('Clients', 'sum')).sort_values('Clients', ascending=False)
+            familles['Part (%)'] = (100 * familles['Clients'] / len(df_clean)).round(1)
+            st.subheader(f"Vue d'ensemble : {optimal_k} micro-segments, {len(familles)} familles de profils")
+            st.dataframe(familles)
+            nb_pages = -(-optimal_k // GROUPES_PAR_PAGE)
+            page = st.number_input(f"Page des fiches (sur {nb_pages}, {GROUPES_PAR_PAGE} groupes par page)", min_value=1, max_value=nb_pages, value=1)
+            groupes = plus_gros_groupes(df_clean, optimal_k)[(page - 1) * GROUPES_PAR_PAGE:page * GROUPES_PAR_PAGE]
+        for i in groupes:
             p = profils.iloc[i]
             nom = generer_description(p, stats_globales)
             with st.expander(f"👤 GROUPE {i+1} : {nom}", expanded=True):
@@ -451,6 +608,8 @@ if uploaded_file is not None:
                     st.write(f"**Pop:** {len(df_clean[df_clean['Cluster']==i])}")
                     st.write(f"**Panier:** {int(p['Panier_Moyen'])} Dhs") # Pas de revenu
                     st.write(f"**Fidélité:** {int(p['Score_Fidelite'])}/100")
+                    if stabilite['score'] is not None:
+                        st.write(f"**Stabilité:** {stabilite['segments']['jaccard_moyen'].iloc[i]:.2f}")
                 with c_act:
                     # Logique de recommandation
                     if p['Score_Fidelite'] < 40: st.error("🚨 ACTION : Campagne Rétention")
@@ -459,8 +618,25 @@ if uploaded_file is not None:
                     else: st.info("📧 ACTION : Newsletter")
                 with c_dl:
                     # Bouton pour télécharger juste ce groupe
+                    # (le fichier n'est fabriqué qu'au clic, bloc par bloc)
                     df_grp = df_clean[df_clean['Cluster']==i]
-                    st.download_button("📥 CSV", df_grp.to_csv(index=False).encode('utf-8'), f"groupe_{i+1}.csv", "text/csv", key=f"dl_{i}")
+                    st.download_button("📥 CSV", lambda df_grp=df_grp: b"".join(flux_csv(df_grp)), f"groupe_{i+1}.csv", "text/csv", key=f"dl_{i}")
+
+        # Recherche rapide dans la base indexée (sans refiltrer tout le tableau)
+        st.subheader("🔎 Recherche de membres")
+        # La base indexée est construite au premier usage : l'affichage des résultats ne l'attend pas
+        if st.toggle("Activer la recherche (construit la base indexée au premier usage)", key="recherche_active"):
+            c_seg, c_col, c_op, c_val = st.columns([1, 1.5, 0.7, 1])
+            with c_seg: seg = st.selectbox("Segment", range(optimal_k), format_func=lambda i: f"Groupe {i+1}")
+            colonnes_filtre = [col for col in df_clean.columns if col not in ('id_client', 'Cluster')]
+            with c_col: col_filtre = st.selectbox("Critère", colonnes_filtre)
+            with c_op: op_filtre = st.selectbox("Condition", ['<', '<=', '>', '>=', '='])
+            with c_val: val_filtre = st.number_input("Valeur", value=float(df_clean[col_filtre].median()))
+            filtres = {col_filtre: (op_filtre, val_filtre)}
+            # Seule la colonne filtrée est indexée (la première fois qu'elle est choisie)
+            chemin_base = base_indexee.preparer([col_filtre])
+            st.write(f"**{compter(chemin_base, seg, filtres)} clients** correspondent (aperçu des 500 premiers) :")
+            st.dataframe(rechercher(chemin_base, seg, filtres, limite=500), hide_index=True)
 
     # Onglet 3 : Carte des bulles
     with tab3:
@@ -475,12 +651,37 @@ if uploaded_file is not None:
         with c_ex1:
             st.info("📊 Données Segmentées")
             # Le CSV complet contient la colonne Cluster
-            st.download_button("📥 Télécharger CSV Complet", df_clean.to_csv(index=False).encode('utf-8'), "audience_analysee.csv", "text/csv")
+            # Les fichiers ne sont fabriqués qu'au clic, en parallèle et bloc par bloc (plus à chaque rafraîchissement)
+            st.download_button("📥 Télécharger CSV Complet", lambda: b"".join(flux_csv(df_clean)), "audience_analysee.csv", "text/csv")
+            st.download_button("📥 Télécharger CSV Compressé (.gz)", lambda: b"".join(flux_csv(df_clean, compression='gzip')), "audience_analysee.csv.gz", "application/gzip")
+            st.download_button("📥 Télécharger tous les Segments (ZIP)", lambda: b"".join(flux_zip_segments(df_clean)), "segments_audience.zip", "application/zip")
+            st.download_button("📥 Télécharger au format Parquet", lambda: parquet_en_memoire(df_clean), "audience_analysee.parquet", "application/octet-stream")
+            # Le modèle à charger dans le service temps réel (python service_segments.py modele_segments.json)
+            descriptions = [generer_description(profils.iloc[i], stats_globales) for i in range(optimal_k)]
+            st.download_button("📥 Télécharger le Modèle (Service Temps Réel)", modele_en_json(descriptions=descriptions, **modele), "modele_segments.json", "application/json")
+            # La base indexée (SQLite) : interrogeable avec base_segments.rechercher ou tout outil SQL
+            # (construite au clic si la recherche ne l'a pas déjà fait)
+            st.download_button("📥 Télécharger la Base Indexée (SQLite)", lambda: Path(base_indexee.preparer()).read_bytes(), "audience_segments.sqlite", "application/vnd.sqlite3")
         with c_ex2:
             st.success("📄 Rapport Consulting PDF")
-            # Génération du PDF Expert
-            pdf_bytes = generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow, fig_bubble, fig_radar)
-            st.download_button("📥 Télécharger le Rapport PDF", pdf_bytes, "Rapport_Segmentation_Expert.pdf", "application/pdf")
+            # Génération du PDF Expert (au clic seulement : environ 1 seconde, pas à chaque rafraîchissement)
+            st.download_button("📥 Télécharger le Rapport PDF",
+                               lambda: generer_pdf_expert(df_clean, optimal_k, profils, stats_globales, fig_elbow, fig_bubble, fig_radar, stabilite),
+                               "Rapport_Segmentation_Expert.pdf", "application/pdf")
+
+    # Compte-rendu du mode Budget Temps : le temps réel, du dépôt du fichier à la fin de l'affichage
+    if rapport_budget is not None:
+        if st.session_state.duree_totale_s is None:
+            st.session_state.duree_totale_s = time.perf_counter() - debut_execution
+        duree = st.session_state.duree_totale_s
+        verdict = f"Budget {'respecté' if duree <= budget_s else 'dépassé'} : {duree:.1f}s du dépôt à l'affichage (budget {budget_s}s)"
+        if rapport_budget['exact'] and duree <= budget_s:
+            zone_budget.info(f"⏱️ {verdict}, avec le calcul exact.")
+        elif rapport_budget['exact']:
+            zone_budget.warning(f"⏱️ {verdict}, avec le calcul exact.")
+        else:
+            zone_budget.warning(f"⏱️ {verdict}. Calcul accéléré : " + " ; ".join(rapport_budget['approximations'])
+                                + f". Perte estimée : {rapport_budget['perte_inertie_pct']:+.1f}% d'inertie, accord {rapport_budget['accord_ari']:.2f} avec le calcul exact.")
 
 else:
     # Si aucun fichier n'est chargé, on affiche un message d'attente
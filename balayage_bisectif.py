@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Balayage rapide du nombre de groupes (K-Means Bisectif).
+          Au lieu d'entraîner 9 K-Means complets (x10 initialisations), on
+          construit UN SEUL arbre de découpage : on part d'un groupe unique,
+          puis on coupe en deux le groupe le plus dispersé, encore et encore.
+          Chaque étage de l'arbre donne la partition et l'inertie pour un k.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import numpy as np               # Moteur de calcul mathématique
+from sklearn.cluster import KMeans
+
+# ==============================================================================
+# 2. LES OUTILS
+# ==============================================================================
+
+def _inertie_par_groupe(X, labels, centres):
+    """Somme des distances au carré entre chaque client et le centre de son groupe, groupe par groupe."""
+    distances = ((X - centres[labels]) ** 2).sum(axis=1)
+    return np.bincount(labels, weights=distances, minlength=len(centres))
+
+
+def _couper_en_deux(X_groupe, random_state, n_init):
+    """Un petit 2-Means sur les seuls clients du groupe à couper."""
+    km = KMeans(n_clusters=2, random_state=random_state, n_init=n_init).fit(X_groupe)
+    return km.labels_, km.cluster_centers_
+
+# ==============================================================================
+# 3. LE BALAYAGE
+# ==============================================================================
+
+def balayage_bisectif(df_scaled, k_max=9, n_lloyd=3, n_init=3, random_state=42):
+    """
+    Construit l'arbre de découpage une seule fois et lit l'inertie pour k = 1 ... k_max.
+
+    - n_lloyd : nombre d'itérations de K-Means classique pour affiner chaque étage,
+      en partant des centres obtenus après la coupe (0 = pas d'affinage, arbre pur).
+    - n_init : nombre d'essais pour chaque coupe en deux.
+
+    Retourne (inertie, k_range, partitions) :
+      inertie    -> liste des inerties (directement utilisable par trouver_coude_automatique)
+      k_range    -> range(1, k_max + 1)
+      partitions -> dictionnaire {k: (labels, centres)} pour chaque étage
+    """
+    X = np.asarray(df_scaled, dtype=float)
+    k_max = min(k_max, len(X))
+
+    # Étage 1 : tout le monde dans le même groupe
+    labels = np.zeros(len(X), dtype=np.int32)
+    centres = X.mean(axis=0, keepdims=True)
+    inertie_groupes = _inertie_par_groupe(X, labels, centres)
+
+    inertie = [inertie_groupes.sum()]
+    partitions = {1: (labels.astype(np.int16), centres)}
+
+    for k in range(2, k_max + 1):
+        # On coupe le groupe le plus dispersé (celui qui a la plus grande inertie)
+        a_couper = int(np.argmax(inertie_groupes))
+        membres = np.flatnonzero(labels == a_couper)
+        sous_labels, sous_centres = _couper_en_deux(X[membres], random_state, n_init)
+
+        # La moitié "1" devient un nouveau groupe, la moitié "0" garde l'ancien numéro
+        labels[membres[sous_labels == 1]] = k - 1
+        centres = np.vstack([centres, sous_centres[1]])
+        centres[a_couper] = sous_centres[0]
+
+        # Affinage : quelques pas de K-Means sur toute la base, initialisés par la coupe
+        if n_lloyd > 0:
+            km = KMeans(n_clusters=k, init=centres, n_init=1, max_iter=n_lloyd).fit(X)
+            labels, centres = km.labels_.astype(np.int32), km.cluster_centers_
+
+        inertie_groupes = _inertie_par_groupe(X, labels, centres)
+        inertie.append(inertie_groupes.sum())
+        partitions[k] = (labels.astype(np.int16), centres.copy())
+
+    return inertie, range(1, k_max + 1), partitions
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Banc de charge de l'application Streamlit (sessions simultanées).
+          Simule plusieurs analystes qui utilisent l'application en même
+          temps, sans navigateur, grâce à l'outil de test intégré de Streamlit
+          (streamlit.testing.v1.AppTest). Chaque session dépose une base
+          générée de taille variable, puis navigue (recherche de membres,
+          changement de critère, téléchargements), ce qui relance le script
+          comme un vrai clic.
+          Mesures : latence par session, mémoire maximale du serveur, débit,
+          et un chiffre de CAPACITÉ reproductible pour la machine testée.
+
+LANCEMENT :
+    python banc_charge_app.py --sessions 1 2 4 8 --tailles 2000 20000 --sla 60
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import argparse                  # Lecture des options de la ligne de commande
+import inspect                   # Pour vérifier la forme de la fonction de Streamlit que l'on intercepte
+import multiprocessing           # Processus « propres » pour chaque session
+import os                        # Nombre de cœurs et mémoire de la machine
+import sys                       # Pour connaître le système (macOS compte la mémoire en octets)
+import time                      # Chronométrage
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource              # Mémoire maximale du processus (pic) : Linux et macOS seulement
+except ImportError:              # Windows : pas de pic mesurable, on se contente de la mémoire actuelle
+    resource = None
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+from simulation_evenements import generer_profils
+
+FICHIER_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app_audience.py')
+
+# ==============================================================================
+# 2. LES OUTILS DE MESURE
+# ==============================================================================
+# NOTE : AppTest range son faux serveur dans une variable globale du processus.
+# Deux sessions dans le même processus se marcheraient dessus : chaque session
+# tourne donc dans son propre processus. La mémoire du "serveur" est estimée par
+# la mémoire de base (Python + librairies, partagée dans un vrai serveur) plus
+# la mémoire ajoutée par chaque session.
+
+def _memoire_mo():
+    """
+    Mémoire actuellement utilisée par le processus.
+    Linux : /proc ; sinon psutil s'il est installé ; sinon le pic connu (0 si rien n'est mesurable).
+    """
+    try:
+        with open('/proc/self/status') as statut:
+            for ligne in statut:
+                if ligne.startswith('VmRSS:'):
+                    return int(ligne.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil  # Dépendance optionnelle (utile sous Windows)
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        return _pic_memoire_mo()
+
+
+def _pic_memoire_mo(enfants=False):
+    """
+    Pic de mémoire depuis le démarrage (ko sous Linux, octets sous macOS),
+    du processus ou de ses sous-processus de calcul. 0 sans le module 'resource' (Windows).
+    """
+    if resource is None:
+        return 0.0
+    pic = resource.getrusage(resource.RUSAGE_CHILDREN if enfants else resource.RUSAGE_SELF).ru_maxrss
+    return pic / 1024 / 1024 if sys.platform == 'darwin' else pic / 1024
+
+
+# Les téléchargements de l'application sont "différés" : le fichier n'est fabriqué qu'au clic,
+# quand le navigateur le réclame au serveur. Sans navigateur, on note chaque fonction
+# enregistrée pour pouvoir l'exécuter nous-mêmes, exactement comme le ferait le serveur.
+_TELECHARGEMENTS_DIFFERES = {}
+# Forme attendue de MediaFileManager.add_deferred (vérifiée avec Streamlit 1.66)
+_PARAMETRES_ATTENDUS = ['self', 'data_callable']
+
+
+def _capturer_telechargements():
+    """
+    Intercepte MediaFileManager.add_deferred pour noter la fonction de chaque téléchargement.
+    Appelée dans le processus de la session uniquement (importer ce module ne modifie rien).
+    C'est une fonction interne de Streamlit : si une mise à jour change sa forme, on s'arrête
+    avec un message clair plutôt que de mesurer des téléchargements qui n'ont pas eu lieu.
+    """
+    try:
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        original = MediaFileManager.add_deferred
+    except (ImportError, AttributeError) as erreur:
+        raise RuntimeError(f"Streamlit {streamlit.__version__} : téléchargements différés introuvables "
+                           f"({erreur}). Le banc de charge doit être adapté à cette version.") from erreur
+    if getattr(original, 'capture_banc', False):
+        return  # Déjà installée dans ce processus
+    parametres = list(inspect.signature(original).parameters)
+    if parametres[:2] != _PARAMETRES_ATTENDUS:
+        raise RuntimeError(f"Streamlit {streamlit.__version__} : MediaFileManager.add_deferred a changé "
+                           f"de forme ({parametres}). Le banc de charge doit être adapté à cette version.")
+
+    def _enregistrer_telechargement(self, fonction, *args, **kwargs):
+        identifiant = original(self, fonction, *args, **kwargs)
+        _TELECHARGEMENTS_DIFFERES[identifiant] = fonction
+        return identifiant
+
+    _enregistrer_telechargement.capture_banc = True
+    MediaFileManager.add_deferred = _enregistrer_telechargement
+
+# ==============================================================================
+# 3. UNE SESSION D'ANALYSTE
+# ==============================================================================
+
+def generer_csv(nb_clients, graine):
+    """Une base clients au format CSV (mêmes règles que 'CREATION DATASET.py')."""
+    return generer_profils(nb_clients, np.random.default_rng(graine)).to_csv(index=False).encode('utf-8')
+
+
+def _verifier(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def simuler_session(numero, donnees_csv, nb_interactions=3, telechargements=True, timeout_s=600):
+    """
+    Déroule le parcours d'un analyste et chronomètre chaque étape :
+      1. ouverture de la page
+      2. dépôt du fichier (analyse complète + graphiques)
+      3. quelques clics dans la recherche de membres (chaque clic relance le script)
+      4. un clic sur chaque bouton de téléchargement + fabrication du fichier (PDF compris)
+    Les 4 onglets sont construits à chaque relance (c'est le fonctionnement de st.tabs) :
+    les parcourir ne coûte rien de plus côté serveur.
+    """
+    if telechargements:
+        _capturer_telechargements()
+    base_mo = _memoire_mo()  # Remplacée après l'ouverture de la page (si elle réussit)
+    resultat = {'session': numero, 'taille': donnees_csv.count(b'\n') - 1, 'erreur': None, 'nb_relances': 0}
+    debut = time.perf_counter()
+    try:
+        at = AppTest.from_file(FICHIER_APP, default_timeout=timeout_s)
+
+        t0 = time.perf_counter()
+        at.run()
+        resultat['ouverture_s'] = time.perf_counter() - t0
+        # La base est prise APRÈS l'ouverture : Python, Streamlit et les librairies de l'application
+        # (scikit-learn, matplotlib...) sont alors chargés. Ils sont partagés par toutes les sessions
+        # d'un vrai serveur : seule la mémoire au-delà de cette base est propre à la session.
+        base_mo = _memoire_mo()
+
+        t0 = time.perf_counter()
+        at.file_uploader[0].upload(f'base_{numero}.csv', donnees_csv, 'text/csv')
+        at.run()
+        resultat['analyse_s'] = time.perf_counter() - t0
+        resultat['nb_relances'] = 2
+        _verifier(at)
+
+        # Navigation : on active la recherche (construction de la base indexée), puis on change
+        # de critère, comme un analyste qui explore les segments
+        at.toggle(key='recherche_active').set_value(True).run()
+        resultat['nb_relances'] += 1
+        _verifier(at)
+        criteres = at.selectbox[1].options
+        durees = []
+        for i in range(nb_interactions):
+            t0 = time.perf_counter()
+            at.selectbox[1].set_value(criteres[(i + 1) % len(criteres)]).run()
+            durees.append(time.perf_counter() - t0)
+            resultat['nb_relances'] += 1
+            _verifier(at)
+        resultat['clic_moyen_s'] = float(np.mean(durees)) if durees else 0.0
+
+        # Téléchargements : le clic relance le script, puis le serveur fabrique le fichier
+        volume, durees = 0, []
+        nb_boutons = len(at.get('download_button')) if telechargements else 0
+        for i in range(nb_boutons):
+            bouton = at.get('download_button')[i]
+            fonction = _TELECHARGEMENTS_DIFFERES.get(bouton.proto.deferred_file_id)
+            if bouton.proto.deferred_file_id and fonction is None:
+                raise RuntimeError(f"Téléchargement '{bouton.label}' non intercepté "
+                                   f"(Streamlit {streamlit.__version__}) : le banc doit être adapté")
+            t0 = time.perf_counter()
+            bouton.click().run()
+            if fonction is not None:
+                contenu = fonction()
+                volume += len(contenu if isinstance(contenu, bytes) else contenu.getvalue())
+            durees.append(time.perf_counter() - t0)
+            resultat['nb_relances'] += 1
+            _verifier(at)
+        resultat['telechargement_moyen_s'] = float(np.mean(durees)) if durees else 0.0
+        resultat['volume_telecharge_mo'] = volume / 1024 / 1024
+    except Exception as erreur:
+        resultat['erreur'] = f"{type(erreur).__name__}: {erreur}"
+    resultat['total_s'] = time.perf_counter() - debut
+    # Mémoire propre à la session : pic du processus moins la base, plus celui de ses sous-processus
+    # de calcul (test de stabilité). Ceux-ci naissent d'un 'fork' (Linux) : ils partagent les pages
+    # de la session, on ne compte donc que ce qu'ils ajoutent au-delà de la même base.
+    resultat['memoire_base_mo'] = base_mo
+    resultat['memoire_session_mo'] = max(_pic_memoire_mo(), _memoire_mo()) - base_mo \
+        + max(_pic_memoire_mo(enfants=True) - base_mo, 0.0)
+    return resultat
+
+# ==============================================================================
+# 4. LES PALIERS DE CHARGE ET LA CAPACITÉ
+# ==============================================================================
+
+def executer_palier(nb_sessions, tailles, nb_interactions=3, telechargements=True, graine=42):
+    """
+    Lance 'nb_sessions' sessions en même temps (tailles de base tirées dans 'tailles', graine fixe
+    pour que le test soit reproductible) et renvoie (tableau par session, résumé du palier).
+    """
+    rng = np.random.default_rng(graine)
+    jeux = [generer_csv(int(rng.choice(tailles)), graine + i) for i in range(nb_sessions)]
+
+    # 'spawn' : chaque session démarre dans un processus neuf (mesure de mémoire non faussée)
+    contexte = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=nb_sessions, mp_context=contexte) as pool:
+        # On attend que tous les processus soient prêts : le chronomètre ne mesure que l'application
+        list(pool.map(time.sleep, [0.5] * nb_sessions))
+        debut = time.perf_counter()
+        futurs = [pool.submit(simuler_session, i, jeu, nb_interactions, telechargements)
+                  for i, jeu in enumerate(jeux)]
+        sessions = [futur.result() for futur in futurs]
+    duree = time.perf_counter() - debut
+
+    tableau = pd.DataFrame(sessions)
+    reussies = tableau[tableau['erreur'].isna()]
+    resume = {
+        'nb_sessions': nb_sessions,
+        'nb_erreurs': int(tableau['erreur'].notna().sum()),
+        'duree_palier_s': round(duree, 2),
+        'latence_p50_s': round(float(reussies['total_s'].median()), 2) if len(reussies) else None,
+        'latence_p95_s': round(float(reussies['total_s'].quantile(0.95)), 2) if len(reussies) else None,
+        'analyse_p95_s': round(float(reussies['analyse_s'].quantile(0.95)), 2) if len(reussies) else None,
+        'sessions_par_min': round(len(reussies) / duree * 60, 2),
+        'relances_par_s': round(reussies['nb_relances'].sum() / duree, 2),
+        # Serveur : une seule copie de Python et des librairies + la mémoire de chaque session
+        'pic_memoire_mo': round(float(tableau['memoire_base_mo'].max() + tableau['memoire_session_mo'].sum()), 1),
+    }
+    return tableau, resume
+
+
+def mesurer_capacite(paliers=(1, 2, 4, 8), tailles=(2000, 20000), sla_s=60.0, nb_interactions=3,
+                     telechargements=True, graine=42):
+    """
+    Monte la charge palier par palier. La CAPACITÉ est le plus grand nombre de sessions
+    simultanées servies sans erreur avec une latence p95 sous le seuil 'sla_s'.
+    On s'arrête au premier palier qui échoue.
+    """
+    resumes, capacite = [], 0
+    for nb_sessions in paliers:
+        _, resume = executer_palier(nb_sessions, tailles, nb_interactions, telechargements, graine)
+        resume['respecte_sla'] = resume['nb_erreurs'] == 0 and resume['latence_p95_s'] is not None \
+            and resume['latence_p95_s'] <= sla_s
+        resumes.append(resume)
+        print(f"   ► {nb_sessions:>3} sessions | p95 {resume['latence_p95_s']}s | "
+              f"mémoire {resume['pic_memoire_mo']} Mo | erreurs {resume['nb_erreurs']}")
+        if not resume['respecte_sla']:
+            break
+        capacite = nb_sessions
+
+    machine = {'coeurs': os.cpu_count(), 'memoire_totale_mo': _memoire_totale_mo()}
+    return {'capacite': capacite, 'sla_s': sla_s, 'machine': machine, 'paliers': pd.DataFrame(resumes)}
+
+
+def _memoire_totale_mo():
+    try:
+        return round(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 / 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Banc de charge de l'application Audience Architect")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Paliers de sessions simultanées")
+    parser.add_argument('--tailles', type=int, nargs='+', default=[2000, 20000], help="Tailles des bases déposées")
+    parser.add_argument('--interactions', type=int, default=3, help="Clics par session après l'analyse")
+    parser.add_argument('--sans-telechargements', action='store_true', help="Ne pas cliquer sur les téléchargements")
+    parser.add_argument('--sla', type=float, default=60.0, help="Latence p95 maximale acceptée (secondes)")
+    parser.add_argument('--graine', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"[CHARGE] Machine : {os.cpu_count()} cœurs, {_memoire_totale_mo()} Mo. Seuil p95 : {args.sla}s")
+    rapport = mesurer_capacite(args.sessions, args.tailles, args.sla, args.interactions,
+                               not args.sans_telechargements, args.graine)
+    print("\n--- PALIERS ---")
+    print(rapport['paliers'].to_string(index=False))
+    print(f"\n✅ CAPACITÉ : {rapport['capacite']} sessions simultanées sur cette machine.")
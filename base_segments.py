@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Base segmentée indexée (SQLite).
+          Chaque client reçoit un identifiant stable, puis la base segmentée
+          est enregistrée dans un fichier SQLite avec des index sur
+          l'identifiant, le Cluster et les colonnes réellement filtrées.
+          Dans l'application, la base n'est construite qu'au premier usage
+          (BaseDifferee) : l'analyse ne l'attend jamais.
+          Une question comme "membres du segment 3 avec Score_Fidelite < 40
+          et Panier_Moyen > 800" répond en quelques millisecondes, sans
+          recharger toute la base en mémoire.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import os                        # Pour remplacer un ancien fichier
+import sqlite3                   # Base de données embarquée (incluse dans Python)
+import threading                 # La base différée peut être demandée par deux fils à la fois
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+
+# Opérateurs autorisés dans les filtres (liste fermée : aucune injection SQL possible)
+OPERATEURS = ('<', '<=', '>', '>=', '=', '!=')
+
+# ==============================================================================
+# 2. L'IDENTIFIANT CLIENT STABLE
+# ==============================================================================
+
+def calculer_ids_clients(df, colonnes=None):
+    """
+    Calcule l'identifiant 'id_client' (entier 64 bits) de chaque ligne à partir de son contenu :
+    le même client garde le même identifiant d'une analyse à l'autre, quel que soit l'ordre du fichier.
+    Deux lignes identiques sont départagées par leur rang d'apparition.
+    ATTENTION : à calculer sur les lignes BRUTES (avant l'imputation des valeurs manquantes).
+    Après imputation, une case vide vaut la moyenne de la colonne : l'identifiant d'un client
+    incomplet changerait dès qu'un autre client du fichier change.
+    L'empreinte ne dépend ni de l'ordre des colonnes (triées par nom), ni de leur type :
+    les colonnes numériques sont converties en float64 (une seule case vide fait passer
+    une colonne d'entiers en décimaux, ce qui changerait sinon l'identifiant de tous les clients).
+    Si la colonne 'id_client' existe déjà (ex : journaux agrégés), elle est reprise telle quelle.
+    """
+    if 'id_client' in df.columns:
+        return df['id_client'].to_numpy()
+    colonnes = sorted(colonnes or [col for col in df.columns if col != 'Cluster'])
+    valeurs = pd.DataFrame({col: df[col].astype(np.float64) if pd.api.types.is_numeric_dtype(df[col]) else df[col]
+                            for col in colonnes})
+    empreinte = pd.util.hash_pandas_object(valeurs, index=False)
+    rang_doublon = empreinte.groupby(empreinte).cumcount()
+    empreinte = pd.util.hash_pandas_object(pd.DataFrame({'e': empreinte, 'r': rang_doublon}), index=False)
+    # SQLite stocke des entiers signés : on relit les 64 bits de l'empreinte comme un entier signé
+    return empreinte.to_numpy().view(np.int64)
+
+
+def assigner_ids_clients(df, colonnes=None, ids=None):
+    """
+    Ajoute la colonne 'id_client' en première position (voir calculer_ids_clients).
+    'ids' : identifiants déjà calculés sur les lignes brutes (même ordre que df).
+    Si la colonne 'id_client' existe déjà, elle est conservée.
+    """
+    if 'id_client' in df.columns:
+        return df
+    if ids is None:
+        ids = calculer_ids_clients(df, colonnes)
+    df = df.copy()
+    df.insert(0, 'id_client', np.asarray(ids, dtype=np.int64))
+    return df
+
+# ==============================================================================
+# 3. L'ENREGISTREMENT DE LA BASE
+# ==============================================================================
+
+def sauvegarder_base(df, chemin, colonnes_index=(), taille_lot=50000):
+    """
+    Écrit la base segmentée dans un fichier SQLite puis construit les index :
+      - clé primaire sur id_client (recherche d'un client)
+      - Cluster (membres d'un segment)
+      - (Cluster, colonne) pour chaque colonne de 'colonnes_index' seulement (les colonnes
+        réellement filtrées : chaque index coûte du temps à la construction, voir indexer_colonnes)
+    L'ancien fichier est remplacé. Retourne le chemin.
+    """
+    df = assigner_ids_clients(df)
+    colonnes = [col for col in df.columns if col not in ('id_client', 'Cluster')]
+    if os.path.exists(chemin):
+        os.remove(chemin)
+
+    types = {col: 'INTEGER' if pd.api.types.is_integer_dtype(df[col]) else 'REAL' for col in colonnes}
+    schema = ', '.join([f'"{col}" {types[col]}' for col in colonnes])
+    with sqlite3.connect(chemin) as connexion:
+        # Chargement en masse : on désactive le journal le temps de l'écriture
+        connexion.execute('PRAGMA journal_mode = OFF')
+        connexion.execute('PRAGMA synchronous = OFF')
+        connexion.execute(f'CREATE TABLE clients (id_client INTEGER PRIMARY KEY, Cluster INTEGER NOT NULL, {schema})')
+        df[['id_client', 'Cluster'] + colonnes].to_sql('clients', connexion, if_exists='append', index=False,
+                                                       chunksize=taille_lot)
+        # Les index sont construits après le chargement (bien plus rapide que ligne par ligne)
+        connexion.execute('CREATE INDEX idx_cluster ON clients (Cluster)')
+        _creer_index(connexion, colonnes_index)
+    connexion.close()
+    return chemin
+
+
+def _creer_index(connexion, colonnes):
+    existantes = [ligne[1] for ligne in connexion.execute('PRAGMA table_info(clients)')]
+    for col in colonnes:
+        if col not in existantes:
+            raise ValueError(f"Colonne inconnue : '{col}'")
+        connexion.execute(f'CREATE INDEX IF NOT EXISTS "idx_cluster_{col}" ON clients (Cluster, "{col}")')
+    connexion.execute('ANALYZE')  # Statistiques pour que SQLite choisisse le meilleur index
+
+
+def indexer_colonnes(chemin, colonnes):
+    """Ajoute l'index (Cluster, colonne) des colonnes demandées (rien à faire s'il existe déjà)."""
+    with sqlite3.connect(chemin) as connexion:
+        _creer_index(connexion, colonnes)
+    connexion.close()
+
+
+class BaseDifferee:
+    """
+    Base indexée construite au premier usage seulement (recherche de membres, téléchargement),
+    et non à chaque analyse : écrire et indexer un million de lignes prend plusieurs secondes.
+    Chaque colonne filtrée reçoit son index la première fois qu'elle est utilisée.
+        base = BaseDifferee(df, 'base.sqlite') ; rechercher(base.preparer(['Score_Fidelite']), ...)
+    """
+    def __init__(self, df, chemin):
+        self.df = df
+        self.chemin = chemin
+        self.construite = False
+        self.colonnes_indexees = set()
+        self._verrou = threading.Lock()
+
+    def preparer(self, colonnes_index=()):
+        """Construit la base si besoin, indexe les colonnes demandées, et renvoie son chemin."""
+        with self._verrou:
+            nouvelles = [col for col in colonnes_index if col not in self.colonnes_indexees]
+            if not self.construite:
+                sauvegarder_base(self.df, self.chemin, nouvelles)
+                self.construite = True
+            elif nouvelles:
+                indexer_colonnes(self.chemin, nouvelles)
+            self.colonnes_indexees.update(nouvelles)
+        return self.chemin
+
+# ==============================================================================
+# 4. LES RECHERCHES
+# ==============================================================================
+
+def _construire_requete(connexion, cluster, filtres, colonnes):
+    """Assemble la requête SQL en vérifiant chaque nom de colonne contre le schéma réel."""
+    existantes = [ligne[1] for ligne in connexion.execute('PRAGMA table_info(clients)')]
+    conditions, parametres = [], []
+    if cluster is not None:
+        conditions.append('Cluster = ?')
+        parametres.append(int(cluster))
+    for col, (operateur, valeur) in (filtres or {}).items():
+        if col not in existantes:
+            raise ValueError(f"Colonne inconnue : '{col}'")
+        if operateur not in OPERATEURS:
+            raise ValueError(f"Opérateur inconnu : '{operateur}' (choix possibles : {', '.join(OPERATEURS)})")
+        conditions.append(f'"{col}" {operateur} ?')
+        parametres.append(valeur)
+    for col in colonnes or []:
+        if col not in existantes:
+            raise ValueError(f"Colonne inconnue : '{col}'")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, parametres
+
+
+def rechercher(chemin, cluster=None, filtres=None, colonnes=None, limite=None):
+    """
+    Renvoie les clients qui correspondent, sans charger la base entière.
+    - cluster : numéro du segment tel qu'enregistré (0 = "Groupe 1")
+    - filtres : {'Score_Fidelite': ('<', 40), 'Panier_Moyen': ('>', 800)}
+    - colonnes : colonnes à renvoyer (toutes par défaut)
+    Exemple : rechercher('base.sqlite', cluster=2, filtres={'Score_Fidelite': ('<', 40)})
+    """
+    with sqlite3.connect(f'file:{chemin}?mode=ro', uri=True) as connexion:
+        where, parametres = _construire_requete(connexion, cluster, filtres, colonnes)
+        selection = ', '.join(f'"{col}"' for col in colonnes) if colonnes else '*'
+        requete = f'SELECT {selection} FROM clients{where}'
+        if limite is not None:
+            requete += f' LIMIT {int(limite)}'
+        resultat = pd.read_sql_query(requete, connexion, params=parametres)
+    connexion.close()
+    return resultat
+
+
+def compter(chemin, cluster=None, filtres=None):
+    """Nombre de clients qui correspondent (réponse directe depuis les index)."""
+    with sqlite3.connect(f'file:{chemin}?mode=ro', uri=True) as connexion:
+        where, parametres = _construire_requete(connexion, cluster, filtres, None)
+        nombre = connexion.execute(f'SELECT COUNT(*) FROM clients{where}', parametres).fetchone()[0]
+    connexion.close()
+    return nombre
+
+
+def client_par_id(chemin, id_client):
+    """Fiche d'un client à partir de son identifiant (None s'il n'existe pas)."""
+    resultat = rechercher(chemin, filtres={'id_client': ('=', int(id_client))})
+    return resultat.iloc[0] if len(resultat) else None
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Banc d'expériences de segmentation.
+          Compare en une seule exécution plusieurs jeux de colonnes, plusieurs
+          méthodes de mise à l'échelle et plusieurs plages de k.
+          Le travail commun (statistiques, colonnes normalisées, modèles K-Means)
+          n'est calculé qu'une seule fois puis partagé entre les configurations.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import hashlib                   # Empreinte des données (clé du cache des modèles)
+import itertools                 # Pour construire toutes les combinaisons de la grille
+import sqlite3                   # Pour enregistrer les résultats dans une base interrogeable (SQL)
+import time                      # Pour chronométrer chaque modèle
+from collections import OrderedDict  # Cache des modèles : on oublie d'abord les plus anciens
+from concurrent.futures import ThreadPoolExecutor  # Pour lancer plusieurs modèles en parallèle
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+from sklearn.cluster import KMeans
+from sklearn.metrics import (adjusted_rand_score, calinski_harabasz_score,
+                             davies_bouldin_score, silhouette_score)
+from threadpoolctl import threadpool_limits  # Pour éviter que chaque thread réclame tous les cœurs
+
+from noyau_segmentation import FEATURES_APP, FEATURES_TOUTES, trouver_coude_automatique
+
+# Les méthodes de mise à l'échelle disponibles (même calcul que StandardScaler, MinMaxScaler, RobustScaler)
+SCALERS = ('standard', 'minmax', 'robust')
+
+# Mémoire des modèles déjà entraînés : (empreinte des données, colonnes, scaler, k, graine, n_init) -> résultat
+# Elle survit entre deux appels pour ne jamais recalculer un modèle identique.
+# L'empreinte du contenu garantit que deux bases de même taille ne partagent jamais leurs résultats.
+# Taille bornée (chaque résultat garde les labels de toute la base) : les plus anciens sont oubliés.
+_CACHE_AJUSTEMENTS = OrderedDict()
+TAILLE_MAX_CACHE = 128
+
+# ==============================================================================
+# 2. LE TRAVAIL PARTAGÉ (CALCULÉ UNE SEULE FOIS)
+# ==============================================================================
+
+def calculer_stats_colonnes(df, colonnes):
+    """
+    Calcule en un seul passage toutes les statistiques dont les scalers ont besoin
+    (moyenne, écart-type, min, max, médiane, quartiles) pour chaque colonne.
+    """
+    X = df[colonnes].to_numpy(dtype=float)
+    q1, mediane, q3 = np.percentile(X, [25, 50, 75], axis=0)
+    return pd.DataFrame({
+        'moyenne': X.mean(axis=0),
+        'ecart_type': X.std(axis=0),
+        'min': X.min(axis=0),
+        'max': X.max(axis=0),
+        'mediane': mediane,
+        'q1': q1,
+        'q3': q3,
+    }, index=colonnes)
+
+
+def parametres_scaler(stats, scaler):
+    """
+    Traduit le nom d'un scaler en (centre, échelle) pour chaque colonne.
+    Une colonne constante garde une échelle de 1 (comme dans scikit-learn).
+    """
+    if scaler == 'standard':
+        centre, echelle = stats['moyenne'], stats['ecart_type']
+    elif scaler == 'minmax':
+        centre, echelle = stats['min'], stats['max'] - stats['min']
+    elif scaler == 'robust':
+        centre, echelle = stats['mediane'], stats['q3'] - stats['q1']
+    else:
+        raise ValueError(f"Scaler inconnu : '{scaler}' (choix possibles : {', '.join(SCALERS)})")
+    echelle = echelle.where(echelle != 0, 1.0)
+    return centre, echelle
+
+
+def normaliser_colonnes(df, stats, scalers):
+    """
+    Met chaque colonne à l'échelle une seule fois par scaler.
+    Comme les scalers travaillent colonne par colonne, une colonne normalisée
+    est réutilisable telle quelle dans tous les jeux de colonnes qui la contiennent.
+    """
+    colonnes_normalisees = {}
+    for scaler in scalers:
+        centre, echelle = parametres_scaler(stats, scaler)
+        for col in stats.index:
+            valeurs = df[col].to_numpy(dtype=float)
+            colonnes_normalisees[(scaler, col)] = (valeurs - centre[col]) / echelle[col]
+    return colonnes_normalisees
+
+# ==============================================================================
+# 3. L'ENTRAÎNEMENT D'UN MODÈLE (UNE CASE DE LA GRILLE)
+# ==============================================================================
+
+def _ajuster(X, k, random_state, n_init, taille_echantillon_score):
+    """
+    Entraîne un K-Means et mesure sa qualité (inertie, silhouette, Calinski, Davies-Bouldin).
+    La silhouette coûte O(n²) : on la calcule sur un échantillon borné.
+    Les modèles tournent déjà en parallèle (un par thread) : chacun n'utilise qu'un cœur.
+    """
+    with threadpool_limits(limits=1):
+        return _ajuster_un_coeur(X, k, random_state, n_init, taille_echantillon_score)
+
+
+def _ajuster_un_coeur(X, k, random_state, n_init, taille_echantillon_score):
+    debut = time.perf_counter()
+    km = KMeans(n_clusters=k, random_state=random_state, n_init=n_init).fit(X)
+    duree = time.perf_counter() - debut
+
+    resultat = {
+        'inertie': km.inertia_,
+        'silhouette': np.nan,
+        'calinski_harabasz': np.nan,
+        'davies_bouldin': np.nan,
+        'temps_s': duree,
+        'labels': km.labels_.astype(np.int16),
+    }
+    # Les scores de séparation n'ont de sens qu'entre 2 et n-1 groupes
+    if 1 < k < len(X):
+        resultat['silhouette'] = silhouette_score(
+            X, km.labels_, sample_size=min(taille_echantillon_score, len(X)), random_state=random_state)
+        resultat['calinski_harabasz'] = calinski_harabasz_score(X, km.labels_)
+        resultat['davies_bouldin'] = davies_bouldin_score(X, km.labels_)
+    return resultat
+
+# ==============================================================================
+# 4. LE CHEF D'ORCHESTRE DE LA GRILLE
+# ==============================================================================
+
+def executer_grille(df, sous_ensembles=None, scalers=('standard',), k_ranges=(range(1, 10),),
+                    random_state=42, n_init=10, n_jobs=None, taille_echantillon_score=10000):
+    """
+    Lance toutes les configurations (jeu de colonnes x scaler x plage de k).
+
+    - sous_ensembles : dictionnaire {nom: liste de colonnes}. Par défaut, on compare
+      les 4 colonnes de l'application et les 12 colonnes du script d'analyse.
+    - n_jobs : nombre de modèles entraînés en même temps (None = automatique).
+
+    Retourne un dictionnaire de tableaux pandas :
+      'table'   -> une ligne par (configuration, k) avec inertie, scores et temps
+                   (un modèle repris du cache compte 0 seconde, colonne 'depuis_cache')
+      'choix'   -> une ligne par configuration avec le k choisi (coude et silhouette)
+      'accords' -> l'accord (Adjusted Rand Index) entre les groupes de chaque paire de configurations
+      'stats'   -> les statistiques de colonnes partagées
+    """
+    if sous_ensembles is None:
+        sous_ensembles = {'app': FEATURES_APP, 'analyse': FEATURES_TOUTES}
+
+    # On nettoie une seule fois (même imputation par la moyenne que l'application)
+    toutes_colonnes = sorted({col for cols in sous_ensembles.values() for col in cols})
+    df_clean = df[toutes_colonnes].fillna(df[toutes_colonnes].mean())
+
+    # Travail partagé : statistiques puis colonnes normalisées
+    debut = time.perf_counter()
+    stats = calculer_stats_colonnes(df_clean, toutes_colonnes)
+    colonnes_normalisees = normaliser_colonnes(df_clean, stats, scalers)
+    temps_preparation = time.perf_counter() - debut
+
+    # Une matrice par (jeu de colonnes, scaler), partagée par toutes les valeurs de k
+    matrices = {}
+    for (nom, cols), scaler in itertools.product(sous_ensembles.items(), scalers):
+        matrices[(nom, scaler)] = np.column_stack([colonnes_normalisees[(scaler, col)] for col in cols])
+
+    # Liste des modèles uniques : deux plages de k qui se recouvrent partagent leurs modèles
+    ks_uniques = sorted({k for k_range in k_ranges for k in k_range})
+    taches = {}
+    empreintes = {config: hashlib.sha1(np.ascontiguousarray(X).tobytes()).hexdigest() for config, X in matrices.items()}
+    for (nom, scaler), k in itertools.product(matrices, ks_uniques):
+        cle = (empreintes[(nom, scaler)], tuple(sous_ensembles[nom]), scaler, k, random_state, n_init)
+        taches[(nom, scaler, k)] = cle
+
+    # Les modèles de cet appel : ceux déjà en mémoire, puis les nouveaux
+    ajustements, depuis_cache = {}, set()
+    for cle in taches.values():
+        if cle in _CACHE_AJUSTEMENTS:
+            _CACHE_AJUSTEMENTS.move_to_end(cle)  # Utilisé récemment : on le garde plus longtemps
+            ajustements[cle] = _CACHE_AJUSTEMENTS[cle]
+            depuis_cache.add(cle)
+
+    # Entraînement en parallèle de tout ce qui n'est pas déjà en mémoire
+    # (K-Means libère le verrou Python pendant ses calculs : les threads travaillent vraiment en même temps ;
+    #  chaque modèle est limité à un cœur pour ne pas réclamer plus de cœurs que la machine n'en a)
+    a_calculer = {tache: cle for tache, cle in taches.items() if cle not in ajustements}
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futurs = {
+            cle: pool.submit(_ajuster, matrices[(nom, scaler)], k, random_state, n_init, taille_echantillon_score)
+            for (nom, scaler, k), cle in a_calculer.items()
+        }
+        for cle, futur in futurs.items():
+            ajustements[cle] = _CACHE_AJUSTEMENTS[cle] = futur.result()
+    while len(_CACHE_AJUSTEMENTS) > TAILLE_MAX_CACHE:
+        _CACHE_AJUSTEMENTS.popitem(last=False)
+
+    # Construction du tableau de résultats et du choix de k pour chaque configuration
+    lignes, choix, labels_choisis = [], [], {}
+    for (nom, scaler), k_range in itertools.product(matrices, k_ranges):
+        ks = list(k_range)
+        config = f"{nom}|{scaler}|k={ks[0]}-{ks[-1]}"
+        resultats = [ajustements[taches[(nom, scaler, k)]] for k in ks]
+        # Temps réellement passé dans cet appel : un modèle repris du cache n'a rien coûté
+        caches = [taches[(nom, scaler, k)] in depuis_cache for k in ks]
+        temps = [0.0 if cache else r['temps_s'] for r, cache in zip(resultats, caches)]
+        inerties = [r['inertie'] for r in resultats]
+
+        k_coude = ks[trouver_coude_automatique(inerties) - 1]
+        silhouettes = pd.Series([r['silhouette'] for r in resultats], index=ks)
+        k_silhouette = int(silhouettes.idxmax()) if silhouettes.notna().any() else k_coude
+
+        for k, r, duree, cache in zip(ks, resultats, temps, caches):
+            lignes.append({
+                'config': config, 'features': nom, 'scaler': scaler, 'k_range': f"{ks[0]}-{ks[-1]}",
+                'k': k, 'inertie': r['inertie'], 'silhouette': r['silhouette'],
+                'calinski_harabasz': r['calinski_harabasz'], 'davies_bouldin': r['davies_bouldin'],
+                'temps_s': duree, 'depuis_cache': cache, 'k_coude': k == k_coude,
+            })
+        choix.append({
+            'config': config, 'features': nom, 'scaler': scaler, 'k_range': f"{ks[0]}-{ks[-1]}",
+            'nb_colonnes': len(sous_ensembles[nom]), 'k_coude': k_coude, 'k_silhouette': k_silhouette,
+            'temps_total_s': sum(temps),
+        })
+        labels_choisis[config] = ajustements[taches[(nom, scaler, k_coude)]]['labels']
+
+    # Accord entre configurations : les groupes retenus désignent-ils les mêmes clients ?
+    accords = [
+        {'config_a': a, 'config_b': b, 'ari': adjusted_rand_score(labels_choisis[a], labels_choisis[b])}
+        for a, b in itertools.combinations(labels_choisis, 2)
+    ]
+
+    return {
+        'table': pd.DataFrame(lignes),
+        'choix': pd.DataFrame(choix),
+        'accords': pd.DataFrame(accords, columns=['config_a', 'config_b', 'ari']),
+        'stats': stats,
+        'temps_preparation_s': temps_preparation,
+    }
+
+
+def sauvegarder_resultats(resultats, chemin):
+    """
+    Enregistre les tableaux de résultats dans une base SQLite.
+    Exemple de requête : SELECT * FROM table_resultats WHERE scaler='robust' AND k=4
+    """
+    with sqlite3.connect(chemin) as connexion:
+        resultats['table'].to_sql('table_resultats', connexion, if_exists='replace', index=False)
+        resultats['choix'].to_sql('choix', connexion, if_exists='replace', index=False)
+        resultats['accords'].to_sql('accords', connexion, if_exists='replace', index=False)
+        resultats['stats'].to_sql('stats_colonnes', connexion, if_exists='replace', index_label='colonne')
+
+# ==============================================================================
+# 5. LANCEMENT EN LIGNE DE COMMANDE
+# ==============================================================================
+if __name__ == '__main__':
+    nom_fichier = 'audience_architect_data_50k.csv'
+    print(f"[INFO] Lecture du fichier source : '{nom_fichier}'")
+    df = pd.read_csv(nom_fichier)
+
+    print("[ANALYSE] Comparaison 'app' (4 colonnes) vs 'analyse' (12 colonnes), scalers standard et robust...")
+    resultats = executer_grille(df, scalers=('standard', 'robust'))
+
+    print("\n--- CHOIX DE K PAR CONFIGURATION ---")
+    print(resultats['choix'].to_string(index=False))
+    print("\n--- ACCORD ENTRE CONFIGURATIONS (ARI) ---")
+    print(resultats['accords'].to_string(index=False))
+
+    sauvegarder_resultats(resultats, 'experiences_segmentation.sqlite')
+    print("\n✅ Résultats enregistrés : 'experiences_segmentation.sqlite'")
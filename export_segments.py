@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Moteur d'export de la base segmentée.
+          - Formats colonnes compressés (Parquet / Feather), un dossier par Cluster
+          - CSV compressé, encodé par blocs sur plusieurs cœurs
+          - Téléchargements en flux (CSV, ZIP de tous les segments) produits
+            morceau par morceau, sans construire le fichier entier en mémoire
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import gzip                      # Compression CSV (.csv.gz)
+import io                        # Tampon mémoire pour un fichier Parquet unique
+import os                        # Pour créer les dossiers de sortie
+import shutil                    # Pour supprimer l'ancien export
+import tempfile                  # Dossier de travail à côté de la destination
+import zipfile                   # Archive ZIP de tous les segments
+from collections import deque    # File d'attente des blocs en cours d'encodage
+from concurrent.futures import ThreadPoolExecutor  # Encodage de plusieurs blocs en même temps
+
+# Taille d'un bloc de lignes encodé d'un coup
+TAILLE_BLOC = 100000
+
+# ==============================================================================
+# 2. FORMATS COLONNES (PARQUET / FEATHER)
+# ==============================================================================
+
+def _remplacer_dossier(dossier, ecrire):
+    """
+    Écrit un export complet dans un dossier de travail voisin, puis le met à la place de 'dossier'.
+    L'ancien export disparaît en entier : un export avec moins de segments ne laisse pas
+    traîner les anciens dossiers Cluster=N (qui seraient relus avec les nouveaux).
+    Si l'écriture échoue, l'ancien export reste intact.
+    """
+    dossier = os.path.abspath(dossier)
+    parent, nom = os.path.split(dossier)
+    os.makedirs(parent, exist_ok=True)
+    travail = tempfile.mkdtemp(prefix=f".{nom}-", dir=parent)
+    try:
+        resultat = ecrire(travail)
+    except BaseException:
+        shutil.rmtree(travail, ignore_errors=True)
+        raise
+    if os.path.exists(dossier):
+        ancien = tempfile.mkdtemp(prefix=f".{nom}-ancien-", dir=parent)
+        os.replace(dossier, os.path.join(ancien, nom))
+        os.replace(travail, dossier)
+        shutil.rmtree(ancien, ignore_errors=True)
+    else:
+        os.replace(travail, dossier)
+    return resultat
+
+
+def exporter_parquet(df, dossier, colonne='Cluster', compression='zstd'):
+    """
+    Écrit la base au format Parquet, partitionnée par segment :
+    dossier/Cluster=0/..., dossier/Cluster=1/... (lisible directement par pandas, Spark, DuckDB).
+    Un nouvel export remplace entièrement le précédent.
+    """
+    _remplacer_dossier(dossier, lambda travail: df.to_parquet(
+        travail, partition_cols=[colonne], compression=compression, index=False))
+    return dossier
+
+
+def exporter_feather(df, dossier, colonne='Cluster', compression='lz4'):
+    """
+    Écrit un fichier Feather par segment (même découpage que Parquet).
+    Feather est le format le plus rapide à relire depuis pandas.
+    Un nouvel export remplace entièrement le précédent.
+    """
+    def ecrire(travail):
+        for valeur, df_grp in df.groupby(colonne, sort=True):
+            sous_dossier = os.path.join(travail, f"{colonne}={valeur}")
+            os.makedirs(sous_dossier)
+            df_grp.reset_index(drop=True).to_feather(os.path.join(sous_dossier, 'part-00000.feather'),
+                                                     compression=compression)
+            chemins.append(os.path.join(dossier, f"{colonne}={valeur}", 'part-00000.feather'))
+
+    chemins = []
+    _remplacer_dossier(dossier, ecrire)
+    return chemins
+
+
+def parquet_en_memoire(df, compression='zstd'):
+    """Un seul fichier Parquet compressé (colonne Cluster incluse), pour un téléchargement."""
+    tampon = io.BytesIO()
+    df.to_parquet(tampon, compression=compression, index=False)
+    tampon.seek(0)
+    return tampon
+
+# ==============================================================================
+# 3. CSV ENCODÉ PAR BLOCS (PLUSIEURS CŒURS)
+# ==============================================================================
+
+def _encoder_bloc(df_bloc, entete, compression):
+    """Transforme un bloc de lignes en octets CSV (compressés en gzip si demandé)."""
+    donnees = df_bloc.to_csv(index=False, header=entete).encode('utf-8')
+    if compression == 'gzip':
+        # Chaque bloc devient un membre gzip : mis bout à bout, ils forment un .gz valide
+        return gzip.compress(donnees, compresslevel=6)
+    return donnees
+
+
+def flux_csv(df, compression=None, taille_bloc=TAILLE_BLOC, n_jobs=None):
+    """
+    Produit le CSV morceau par morceau (générateur d'octets).
+    Plusieurs blocs sont encodés en parallèle, mais seuls quelques-uns sont en mémoire à la fois.
+    """
+    if compression not in (None, 'gzip'):
+        raise ValueError(f"Compression inconnue : '{compression}' (choix possibles : None, gzip)")
+    nb_workers = n_jobs or os.cpu_count() or 1
+    debuts = range(0, max(len(df), 1), taille_bloc)
+    with ThreadPoolExecutor(max_workers=nb_workers) as pool:
+        en_cours = deque()
+        for debut in debuts:
+            en_cours.append(pool.submit(_encoder_bloc, df.iloc[debut:debut + taille_bloc], debut == 0, compression))
+            # On garde au plus 2 blocs par cœur en attente : mémoire bornée
+            if len(en_cours) >= 2 * nb_workers:
+                yield en_cours.popleft().result()
+        while en_cours:
+            yield en_cours.popleft().result()
+
+
+def exporter_csv_compresse(df, chemin, compression='gzip', taille_bloc=TAILLE_BLOC, n_jobs=None):
+    """Écrit le CSV (par défaut .csv.gz) sur disque, bloc par bloc."""
+    with open(chemin, 'wb') as fichier:
+        for morceau in flux_csv(df, compression, taille_bloc, n_jobs):
+            fichier.write(morceau)
+    return chemin
+
+# ==============================================================================
+# 4. ZIP DE TOUS LES SEGMENTS (EN FLUX)
+# ==============================================================================
+
+class _TamponFlux:
+    """
+    Faux fichier en écriture seule : zipfile y écrit, et on récupère ce qui a été
+    écrit au fur et à mesure pour l'envoyer tout de suite.
+    """
+    def __init__(self):
+        self.morceaux = []
+        self.position = 0
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        self.position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        morceaux, self.morceaux = self.morceaux, []
+        return b''.join(morceaux)
+
+
+def flux_zip_segments(df, colonne='Cluster', prefixe='groupe', taille_bloc=TAILLE_BLOC):
+    """
+    Produit une archive ZIP contenant un CSV par segment (groupe_1.csv, groupe_2.csv...),
+    morceau par morceau : l'archive complète n'existe jamais en mémoire.
+    """
+    tampon = _TamponFlux()
+    with zipfile.ZipFile(tampon, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for valeur, df_grp in df.groupby(colonne, sort=True):
+            with archive.open(f"{prefixe}_{int(valeur) + 1}.csv", mode='w', force_zip64=True) as entree:
+                for morceau in flux_csv(df_grp, taille_bloc=taille_bloc):
+                    entree.write(morceau)
+                    yield tampon.vider()
+    # La fermeture de l'archive écrit le sommaire final
+    yield tampon.vider()
+
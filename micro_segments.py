@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Mode micro-segments (100 à 500 groupes, pour la personnalisation).
+          - K-Means "Hamerly" : grâce à l'inégalité triangulaire, on sait sans
+            rien calculer que la plupart des clients n'ont pas changé de groupe.
+            Seuls les clients "à la frontière" sont comparés à tous les centres.
+            Mémoire : deux bornes par client (et non une par couple client-centre).
+          - Recherche du k en deux temps : une grille grossière (10, 17, 30...)
+            puis une grille fine autour du coude.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import numpy as np               # Moteur de calcul mathématique
+from sklearn.cluster import kmeans_plusplus  # Placement initial des centres (même départ que KMeans)
+
+# Nombre maximal de distances client-centre calculées d'un coup (mémoire bornée : ~64 Mo)
+TAILLE_BLOC_DISTANCES = 8_000_000
+# Taille de l'échantillon utilisé pour la recherche du k
+TAILLE_ECHANTILLON_RECHERCHE = 20000
+# Un micro-segment doit compter au moins ce nombre de clients (sinon ce n'est plus un segment)
+CLIENTS_MIN_PAR_SEGMENT = 10
+
+# ==============================================================================
+# 2. LES DISTANCES (PAR BLOCS)
+# ==============================================================================
+
+def _deux_plus_proches(X, centres):
+    """
+    Pour chaque client : son centre le plus proche, la distance à ce centre (borne haute exacte)
+    et la distance au deuxième plus proche (borne basse). Calcul par blocs de lignes.
+    """
+    n, k = len(X), len(centres)
+    labels = np.empty(n, dtype=np.int64)
+    haute = np.empty(n)
+    basse = np.empty(n)
+    carres_centres = (centres ** 2).sum(axis=1)
+    pas = max(1, TAILLE_BLOC_DISTANCES // max(k, 1))
+    for debut in range(0, n, pas):
+        bloc = X[debut:debut + pas]
+        # |x - c|² = |x|² - 2 x.c + |c|² (une multiplication de matrices au lieu de n x k soustractions).
+        # |x|² est le même pour tous les centres : on ne l'ajoute qu'aux deux distances retenues.
+        d2 = bloc @ centres.T
+        d2 *= -2
+        d2 += carres_centres
+        carres_bloc = (bloc ** 2).sum(axis=1)
+        lignes = np.arange(len(bloc))
+        plus_proche = d2.argmin(axis=1)
+        labels[debut:debut + pas] = plus_proche
+        haute[debut:debut + pas] = np.sqrt(np.maximum(d2[lignes, plus_proche] + carres_bloc, 0))
+        # On masque le plus proche pour lire le deuxième (deux passages simples, plus rapides qu'un tri partiel)
+        d2[lignes, plus_proche] = np.inf
+        basse[debut:debut + pas] = np.sqrt(np.maximum(d2.min(axis=1) + carres_bloc, 0))
+    return labels, haute, basse
+
+# ==============================================================================
+# 3. LE K-MEANS À BORNES (HAMERLY)
+# ==============================================================================
+
+class KMeansHamerly:
+    """
+    K-Means (même résultat que l'algorithme de Lloyd à départ égal) qui évite la plupart
+    des calculs de distances. S'utilise comme le KMeans de scikit-learn :
+        km = KMeansHamerly(n_clusters=300).fit(X) ; km.labels_, km.cluster_centers_, km.inertia_
+    'part_distances_calculees_' indique la part des distances réellement calculées
+    par rapport à Lloyd (ex : 0.05 = 20 fois moins de calculs).
+    """
+    def __init__(self, n_clusters=8, max_iter=300, tol=1e-4, random_state=42):
+        self.n_clusters = n_clusters
+        self.max_iter = max_iter
+        self.tol = tol
+        self.random_state = random_state
+
+    def fit(self, X, centres_init=None):
+        X = np.ascontiguousarray(X, dtype=float)
+        n, k = len(X), self.n_clusters
+        if centres_init is None:
+            centres, _ = kmeans_plusplus(X, k, random_state=self.random_state)
+        else:
+            centres = np.array(centres_init, dtype=float)
+        # Seuil d'arrêt identique à scikit-learn : déplacement des centres vs variance des données
+        seuil = self.tol * np.mean(np.var(X, axis=0))
+
+        labels, haute, basse = _deux_plus_proches(X, centres)
+        calculs = n * k
+        n_iter = 0
+        for n_iter in range(1, self.max_iter + 1):
+            # 1. Chaque centre va au milieu de ses clients.
+            #    Un groupe vide récupère le client le plus mal placé (comme scikit-learn)
+            effectifs = np.bincount(labels, minlength=k)
+            vides = np.flatnonzero(effectifs == 0)
+            if len(vides):
+                eloignes = np.argsort(haute)[-len(vides):]
+                labels[eloignes] = vides
+                haute[eloignes] = 0.0
+                basse[eloignes] = 0.0   # Borne nulle : ces clients seront revérifiés
+                effectifs = np.bincount(labels, minlength=k)
+            sommes = np.column_stack([np.bincount(labels, weights=X[:, j], minlength=k) for j in range(X.shape[1])])
+            nouveaux = np.where(effectifs[:, None] > 0, sommes / np.maximum(effectifs, 1)[:, None], centres)
+            deplacement = np.sqrt(((nouveaux - centres) ** 2).sum(axis=1))
+            centres = nouveaux
+            if (deplacement ** 2).sum() <= seuil:
+                break
+
+            # 2. Mise à jour des bornes sans calcul de distance :
+            #    la distance au centre du client grandit au plus de son déplacement,
+            #    la distance aux autres centres baisse au plus du plus grand déplacement des autres
+            haute += deplacement[labels]
+            if k > 1:
+                ordre = np.argsort(deplacement)
+                basse -= np.where(labels == ordre[-1], deplacement[ordre[-2]], deplacement[ordre[-1]])
+
+            # 3. Demi-distance de chaque centre à son plus proche voisin :
+            #    un client plus proche de son centre que cette demi-distance ne peut pas changer de groupe
+            entre_centres = np.sqrt(np.maximum(((centres[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2), 0))
+            np.fill_diagonal(entre_centres, np.inf)
+            demi_voisin = 0.5 * entre_centres.min(axis=1)
+
+            borne = np.maximum(demi_voisin[labels], basse)
+            a_verifier = np.flatnonzero(haute > borne)
+            if len(a_verifier) == 0:
+                continue
+            # On resserre la borne haute (une seule distance par client) avant de tout recalculer
+            haute[a_verifier] = np.sqrt(((X[a_verifier] - centres[labels[a_verifier]]) ** 2).sum(axis=1))
+            calculs += len(a_verifier)
+            a_verifier = a_verifier[haute[a_verifier] > borne[a_verifier]]
+            if len(a_verifier) == 0:
+                continue
+            # Seuls les clients "à la frontière" sont comparés à tous les centres
+            labels[a_verifier], haute[a_verifier], basse[a_verifier] = _deux_plus_proches(X[a_verifier], centres)
+            calculs += len(a_verifier) * k
+
+        # Affectation finale aux centres définitifs (comme scikit-learn) : le dernier déplacement
+        # des centres a pu faire changer de groupe quelques clients à la frontière
+        labels, _, _ = _deux_plus_proches(X, centres)
+        calculs += n * k
+
+        self.cluster_centers_ = centres
+        self.labels_ = labels
+        self.inertia_ = float(((X - centres[labels]) ** 2).sum())
+        self.n_iter_ = n_iter
+        # (Lloyd : une affectation de départ, une par itération, et la même affectation finale)
+        self.part_distances_calculees_ = calculs / (n * k * (n_iter + 2))
+        return self
+
+    def fit_predict(self, X):
+        return self.fit(X).labels_
+
+    def predict(self, X):
+        return _deux_plus_proches(np.ascontiguousarray(X, dtype=float), self.cluster_centers_)[0]
+
+# ==============================================================================
+# 4. LA RECHERCHE DU K (GROSSIÈRE PUIS FINE)
+# ==============================================================================
+
+def coude_sur_grille(ks, inerties):
+    """
+    Méthode du coude quand les k testés ne sont pas 1, 2, 3... (grille irrégulière) :
+    on travaille en échelle logarithmique et on ramène les deux axes entre 0 et 1,
+    puis on cherche le point le plus éloigné de la droite qui relie les extrémités.
+    """
+    x = np.log(np.asarray(ks, dtype=float))
+    y = np.asarray(inerties, dtype=float)
+    x = (x - x[0]) / (x[-1] - x[0]) if x[-1] > x[0] else np.zeros_like(x)
+    y = (y - y[-1]) / (y[0] - y[-1]) if y[0] > y[-1] else np.zeros_like(y)
+    # Droite de (0, 1) à (1, 0) : distance d'un point = |x + y - 1| / racine(2)
+    return int(ks[int(np.argmax(np.abs(x + y - 1)))])
+
+
+def recherche_grossiere_fine(X, k_min=10, k_max=500, nb_grossier=8, nb_fin=6,
+                             taille_echantillon=TAILLE_ECHANTILLON_RECHERCHE, random_state=42):
+    """
+    Trouve le nombre de micro-segments sans tester les 500 valeurs de k :
+      1. grille grossière espacée géométriquement (10, 17, 30, 52... jusqu'à k_max)
+      2. grille fine entre les deux voisins du coude trouvé
+    Les modèles sont entraînés sur un échantillon (le coude dépend de la forme de la base, pas de sa taille).
+    Retourne (k retenu, liste des inerties, liste des k testés), comme trouver_nombre_ideal.
+    Sur une petite base, la plage est réduite pour garder CLIENTS_MIN_PAR_SEGMENT clients par groupe.
+    """
+    X = np.asarray(X, dtype=float)
+    rng = np.random.default_rng(random_state)
+    if len(X) > taille_echantillon:
+        X = X[rng.choice(len(X), size=taille_echantillon, replace=False)]
+    # On garde au moins CLIENTS_MIN_PAR_SEGMENT clients par micro-segment (plage réduite si besoin)
+    k_max = min(k_max, len(X) // CLIENTS_MIN_PAR_SEGMENT)
+    if k_max < 2:
+        raise ValueError(f"Base trop petite pour des micro-segments ({len(X)} clients, "
+                         f"il en faut au moins {2 * CLIENTS_MIN_PAR_SEGMENT})")
+    k_min = max(2, min(k_min, k_max))
+
+    inerties = {}
+    def _tester(ks):
+        for k in ks:
+            if k not in inerties:
+                inerties[k] = KMeansHamerly(n_clusters=k, random_state=random_state).fit(X).inertia_
+
+    # 1. Grille grossière
+    grossier = np.unique(np.geomspace(k_min, k_max, nb_grossier).round().astype(int))
+    _tester(grossier)
+    k_grossier = coude_sur_grille(grossier, [inerties[k] for k in grossier])
+
+    # 2. Grille fine autour du coude
+    i = int(np.searchsorted(grossier, k_grossier))
+    bas, haut = grossier[max(i - 1, 0)], grossier[min(i + 1, len(grossier) - 1)]
+    _tester(np.unique(np.linspace(bas, haut, nb_fin + 2).round().astype(int)))
+
+    ks = [int(k) for k in sorted(inerties)]
+    inertie = [inerties[k] for k in ks]
+    return coude_sur_grille(ks, inertie), inertie, ks
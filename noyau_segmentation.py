@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Noyau commun de segmentation.
+          Regroupe les constantes et l'algorithme du coude utilisés à la fois
+          par l'application, le script d'analyse et les outils d'expérience.
+=============================================================================
+"""
+
+import numpy as np  # Moteur de calcul mathématique
+
+# ==============================================================================
+# 1. LES COLONNES DE RÉFÉRENCE
+# ==============================================================================
+# Les 4 colonnes utilisées par l'application (On exclut le revenu pour le calcul)
+FEATURES_APP = ['Age', 'Score_Fidelite', 'Panier_Moyen', 'Sensibilite_Promo']
+
+# Les 12 colonnes produites par 'CREATION DATASET.py' (utilisées par le script d'analyse)
+FEATURES_TOUTES = [
+    'Age', 'Revenu_Mensuel_Estime', 'Score_Fidelite', 'Sensibilite_Promo',
+    'Panier_Moyen', 'Frequence_Achat_Mois', 'Temps_Session_Sec', 'Score_Tech_Device',
+    'Taux_Abandon_Panier', 'Note_Satisfaction', 'Nombre_Pages_Vues', 'Jours_Depuis_Dernier_Achat',
+]
+
+# ==============================================================================
+# 2. L'ALGORITHME GÉOMÉTRIQUE (DÉCISION)
+# ==============================================================================
+# Cette fonction mathématique remplace l'œil humain.
+# Elle calcule l'angle de la courbe pour trouver la cassure nette.
+def trouver_coude_automatique(inerties):
+    p1 = np.array([1, inerties[0]])
+    p2 = np.array([len(inerties), inerties[-1]])
+    distances = []
+    for i in range(len(inerties)):
+        p0 = np.array([i+1, inerties[i]])
+        # Calcul de la distance point-droite
+        dist = np.abs(np.cross(p2-p1, p1-p0)) / np.linalg.norm(p2-p1)
+        distances.append(dist)
+    # On retourne l'index du point le plus éloigné
+    return distances.index(max(distances)) + 1
+
+# ==============================================================================
+# 3. LE NOM DES GROUPES (PROFILS MARKETING)
+# ==============================================================================
+# Utilisée par l'application et par le mode multi-magasins : un même profil reçoit le même nom partout.
+def generer_description(stats, global_stats):
+    """
+    Cette fonction donne un nom intelligent au groupe sans parler de revenu.
+    Elle compare les stats du groupe avec la moyenne globale.
+    """
+    tags = []
+    
+    # Règle 1 : Âge
+    if stats['Age'] < global_stats['Age'] - 5: tags.append("GEN Z")
+    elif stats['Age'] > global_stats['Age'] + 5: tags.append("SENIOR")
+    
+    # Règle 2 : Panier Moyen 
+    if stats['Panier_Moyen'] > global_stats['Panier_Moyen'] * 1.2: tags.append("HIGH SPENDER") # Dépense beaucoup
+    elif stats['Panier_Moyen'] < global_stats['Panier_Moyen'] * 0.8: tags.append("PETIT PANIER") # Dépense peu
+    
+    # Règle 3 : Comportement
+    if stats['Sensibilite_Promo'] > 0.5: tags.append("CHASSEUR PROMO")
+    if stats['Score_Fidelite'] > 70: tags.append("FAN")
+    if stats['Score_Fidelite'] < 40: tags.append("VOLATILE") # Infidèle
+    
+    # Si on ne trouve rien de spécial, on l'appelle "Standard"
+    return " / ".join(tags) if tags else "CLIENT STANDARD"
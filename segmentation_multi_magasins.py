@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Segmentation multi-magasins (traitement par lot).
+          Segmente plusieurs bases (un fichier CSV par magasin ou par pays)
+          en parallèle, puis aligne leurs segments sur une RÉFÉRENCE commune :
+          le "Groupe 2" de Casablanca et le "Groupe 2" de Rabat désignent
+          enfin le même profil de clients.
+          - Statistiques de normalisation calculées une seule fois (toutes bases)
+          - Un processus par magasin (le lot profite de tous les cœurs)
+          - Appariement optimal des centres (méthode hongroise) dans l'espace commun
+          - Tableau comparatif consolidé + rapport PDF
+
+LANCEMENT :
+    python segmentation_multi_magasins.py dossier_des_magasins/ --sortie resultats_magasins
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import argparse                  # Lecture des options de la ligne de commande
+import glob                      # Pour trouver tous les fichiers CSV d'un dossier
+import os                        # Chemins et nombre de processeurs
+import time                      # Chronométrage
+from concurrent.futures import ProcessPoolExecutor  # Un magasin par processus
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+from fpdf import FPDF            # Rapport PDF consolidé
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score, pairwise_distances_argmin
+from threadpoolctl import threadpool_limits  # Pour éviter que chaque processus réclame tous les cœurs
+
+from noyau_segmentation import FEATURES_APP, generer_description, trouver_coude_automatique
+from stabilite_segments import apparier_centres
+
+# Nombre maximal de clients (tous magasins confondus) pour apprendre les segments de référence
+TAILLE_REFERENCE = 50000
+
+# ==============================================================================
+# 2. LE TRAVAIL PARTAGÉ (CALCULÉ UNE SEULE FOIS)
+# ==============================================================================
+
+def charger_magasins(dossier):
+    """Lit tous les CSV d'un dossier : {nom du magasin (nom du fichier): tableau}."""
+    chemins = sorted(glob.glob(os.path.join(dossier, '*.csv')))
+    if not chemins:
+        raise ValueError(f"Aucun fichier CSV dans '{dossier}'")
+    return {os.path.splitext(os.path.basename(chemin))[0]: pd.read_csv(chemin) for chemin in chemins}
+
+
+def statistiques_communes(magasins, colonnes):
+    """
+    Moyenne et écart-type de chaque colonne sur TOUTES les bases réunies, en un seul passage
+    (sommes et sommes des carrés par magasin, puis combinées). C'est l'espace commun
+    dans lequel tous les centres sont comparés.
+    """
+    n, somme, somme_carres = 0, np.zeros(len(colonnes)), np.zeros(len(colonnes))
+    for df in magasins.values():
+        X = df[colonnes].to_numpy(dtype=float)
+        valides = ~np.isnan(X)
+        n = n + valides.sum(axis=0)
+        somme += np.nansum(X, axis=0)
+        somme_carres += np.nansum(X ** 2, axis=0)
+    moyenne = somme / n
+    ecart_type = np.sqrt(np.maximum(somme_carres / n - moyenne ** 2, 0.0))
+    # Une colonne constante garde une échelle de 1 (comme StandardScaler)
+    echelle = np.where(ecart_type > 0, ecart_type, 1.0)
+    return moyenne, echelle
+
+
+def normaliser(df, colonnes, moyenne, echelle):
+    """Nettoyage (valeurs manquantes -> moyenne commune) puis mise à l'échelle commune."""
+    X = df[colonnes].to_numpy(dtype=float)
+    X = np.where(np.isnan(X), moyenne, X)
+    return (X - moyenne) / echelle
+
+# ==============================================================================
+# 3. LES SEGMENTS DE RÉFÉRENCE
+# ==============================================================================
+
+def segments_reference(bases, k=None, k_max=9, taille=TAILLE_REFERENCE, n_init=10, random_state=42):
+    """
+    Apprend les segments de référence sur un échantillon qui donne le même poids à chaque
+    magasin (un grand magasin n'impose pas ses segments aux autres).
+    Si k n'est pas fourni, il est choisi par la méthode du coude, comme dans l'application.
+    """
+    rng = np.random.default_rng(random_state)
+    par_magasin = max(1, taille // len(bases))
+    echantillon = np.vstack([X if len(X) <= par_magasin else X[rng.choice(len(X), size=par_magasin, replace=False)]
+                             for X in bases.values()])
+    if k is None:
+        inertie = [KMeans(n_clusters=i, random_state=random_state, n_init=n_init).fit(echantillon).inertia_
+                   for i in range(1, k_max + 1)]
+        k = trouver_coude_automatique(inertie)
+    return KMeans(n_clusters=k, random_state=random_state, n_init=n_init).fit(echantillon).cluster_centers_
+
+# ==============================================================================
+# 4. LA SEGMENTATION D'UN MAGASIN (DANS SON PROPRE PROCESSUS)
+# ==============================================================================
+
+def _segmenter_magasin(nom, X, centres_ref, k_commun, k_max, n_init, random_state):
+    """
+    Segmente un magasin puis renomme ses groupes avec les numéros de la référence.
+    - k_commun=True : même nombre de groupes que la référence (comparaison une à une)
+    - k_commun=False : le magasin choisit son propre k (coude) ; les groupes en trop
+      rejoignent le segment de référence le plus proche
+    """
+    debut = time.perf_counter()
+    with threadpool_limits(limits=1):
+        if k_commun:
+            k = len(centres_ref)
+        else:
+            inertie = [KMeans(n_clusters=i, random_state=random_state, n_init=n_init).fit(X).inertia_
+                       for i in range(1, k_max + 1)]
+            k = trouver_coude_automatique(inertie)
+        km = KMeans(n_clusters=k, random_state=random_state, n_init=n_init).fit(X)
+
+    correspondance = apparier_centres(centres_ref, km.cluster_centers_)
+    labels = correspondance[km.labels_].astype(np.int16)
+    # Qualité de l'alignement : distance entre chaque centre du magasin et son centre de référence
+    distances = np.full(len(centres_ref), np.nan)
+    for groupe, ref in enumerate(correspondance):
+        d = np.linalg.norm(km.cluster_centers_[groupe] - centres_ref[ref])
+        distances[ref] = d if np.isnan(distances[ref]) else min(distances[ref], d)
+    # Accord avec la référence appliquée telle quelle au magasin (1 = mêmes groupes).
+    # Centre le plus proche calculé par blocs : jamais de tableau clients x centres x colonnes en mémoire
+    with threadpool_limits(limits=1):
+        labels_ref = pairwise_distances_argmin(X, centres_ref)
+    return {
+        'nom': nom,
+        'k': k,
+        'labels': labels,
+        'centres': km.cluster_centers_,
+        'correspondance': correspondance,
+        'distance_centre': distances,
+        'accord_reference': adjusted_rand_score(labels_ref, labels),
+        'temps_s': time.perf_counter() - debut,
+    }
+
+# ==============================================================================
+# 5. LE LOT COMPLET
+# ==============================================================================
+
+def segmenter_magasins(magasins, colonnes=None, k=None, k_commun=True, k_max=9,
+                       taille_reference=TAILLE_REFERENCE, n_jobs=None, n_init=10, random_state=42):
+    """
+    Segmente toutes les bases et aligne leurs segments sur la référence commune.
+    - magasins : {nom: tableau} (voir charger_magasins)
+    - colonnes : colonnes de segmentation (par défaut celles de l'application)
+    - k : nombre de segments de référence (None = méthode du coude)
+    Retourne un dictionnaire : 'comparaison' (tableau long), 'parts' (tableau croisé),
+    'magasins' (résultats par magasin, bases avec la colonne 'Segment'), 'descriptions'...
+    """
+    debut = time.perf_counter()
+    colonnes = colonnes or FEATURES_APP
+    for nom, df in magasins.items():
+        manquantes = [col for col in colonnes if col not in df.columns]
+        if manquantes:
+            raise ValueError(f"Magasin '{nom}' : colonnes absentes {manquantes}")
+
+    # Travail partagé : une seule normalisation pour tous les magasins
+    moyenne, echelle = statistiques_communes(magasins, colonnes)
+    bases = {nom: normaliser(df, colonnes, moyenne, echelle) for nom, df in magasins.items()}
+    centres_ref = segments_reference(bases, k, k_max, taille_reference, n_init, random_state)
+
+    # Les profils de référence, en unités réelles, et leur nom marketing
+    profils_ref = pd.DataFrame(centres_ref * echelle + moyenne, columns=colonnes)
+    if set(FEATURES_APP).issubset(colonnes):
+        globales = pd.Series(moyenne, index=colonnes)
+        descriptions = [generer_description(profils_ref.iloc[i], globales) for i in range(len(profils_ref))]
+    else:
+        descriptions = [f"Segment {i + 1}" for i in range(len(profils_ref))]
+
+    # Un processus par magasin : le lot avance aussi vite que le nombre de cœurs le permet
+    nb_workers = min(len(bases), n_jobs or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=nb_workers) as pool:
+        futurs = [pool.submit(_segmenter_magasin, nom, X, centres_ref, k_commun, k_max, n_init, random_state)
+                  for nom, X in bases.items()]
+        resultats = {futur.result()['nom']: futur.result() for futur in futurs}
+
+    for nom, resultat in resultats.items():
+        resultat['df'] = magasins[nom].assign(Segment=resultat['labels'])
+
+    comparaison = table_comparaison(resultats, colonnes, descriptions)
+    # Tableau croisé : colonnes dans l'ordre des groupes (sinon "Groupe 10" passerait avant "Groupe 2")
+    parts = comparaison.pivot(index='magasin', columns='segment', values='part_pct')
+    parts = parts.reindex(columns=[f"Groupe {i + 1}" for i in range(len(descriptions))]).fillna(0.0)
+    return {
+        'colonnes': colonnes,
+        'moyenne': moyenne,
+        'echelle': echelle,
+        'centres_reference': centres_ref,
+        'profils_reference': profils_ref,
+        'descriptions': descriptions,
+        'magasins': resultats,
+        'comparaison': comparaison,
+        'parts': parts,
+        'temps_s': time.perf_counter() - debut,
+    }
+
+
+def table_comparaison(resultats, colonnes, descriptions):
+    """
+    Le tableau consolidé : une ligne par (magasin, segment de référence) avec l'effectif,
+    la part du magasin, le profil moyen (unités réelles) et la distance au centre de référence.
+    """
+    lignes = []
+    for nom, resultat in resultats.items():
+        df = resultat['df']
+        total = len(df)
+        profils = df.groupby('Segment')[colonnes].mean()
+        effectifs = df['Segment'].value_counts()
+        for segment, description in enumerate(descriptions):
+            ligne = {
+                'magasin': nom,
+                'segment': f"Groupe {segment + 1}",
+                'description': description,
+                'effectif': int(effectifs.get(segment, 0)),
+                'part_pct': round(100 * effectifs.get(segment, 0) / total, 2) if total else 0.0,
+                'distance_centre': resultat['distance_centre'][segment],
+                'accord_reference': resultat['accord_reference'],
+            }
+            for col in colonnes:
+                ligne[col] = profils[col].get(segment, np.nan)
+            lignes.append(ligne)
+    return pd.DataFrame(lignes)
+
+# ==============================================================================
+# 6. LE RAPPORT CONSOLIDÉ
+# ==============================================================================
+
+class RapportMagasinsPDF(FPDF):
+    """Même mise en page que le rapport de l'application (en-tête gris, titres bleus)."""
+    def header(self):
+        self.set_font('Arial', 'B', 10)
+        self.set_text_color(150)
+        self.cell(0, 10, 'AUDIENCE ARCHITECT - COMPARAISON MULTI-MAGASINS', 0, 0, 'R')
+        self.ln(15)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.set_text_color(150)
+        self.cell(0, 10, f'Page {self.page_no()} | AUDIENCE ARCHITECT', 0, 0, 'C')
+
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 16)
+        self.set_text_color(13, 71, 161)
+        self.cell(0, 10, title, 0, 1, 'L')
+        self.set_draw_color(13, 71, 161)
+        self.line(10, self.get_y(), 200, self.get_y())
+        self.ln(10)
+
+
+def _latin1(texte):
+    """FPDF 1.7 n'écrit que l'alphabet latin-1 : les autres caractères sont remplacés."""
+    return str(texte).encode('latin-1', 'replace').decode('latin-1')
+
+
+def rapport_pdf(resultats):
+    """Rapport consolidé : segments de référence, puis part de chaque segment dans chaque magasin."""
+    pdf = RapportMagasinsPDF()
+    pdf.add_page()
+    pdf.chapter_title("1. Segments de Reference (communs a tous les magasins)")
+    pdf.set_font('Arial', '', 11)
+    pdf.set_text_color(50)
+    pdf.multi_cell(0, 6, _latin1(
+        f"{len(resultats['magasins'])} bases segmentees, alignees sur {len(resultats['descriptions'])} segments "
+        f"de reference. Un meme numero de groupe designe le meme profil dans chaque magasin."))
+    pdf.ln(4)
+    for i, description in enumerate(resultats['descriptions']):
+        p = resultats['profils_reference'].iloc[i]
+        pdf.set_fill_color(245, 245, 245)
+        pdf.set_font('Arial', 'B', 11)
+        pdf.cell(0, 8, _latin1(f" GROUPE {i + 1} : {description}"), 0, 1, 'L', 1)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(0, 6, _latin1("   " + " | ".join(f"{col} : {p[col]:.1f}" for col in resultats['colonnes'])), 0, 1)
+    pdf.ln(4)
+
+    # Tableau croisé : une ligne par magasin, une colonne par segment (% de la base du magasin)
+    pdf.add_page()
+    pdf.chapter_title("2. Poids de chaque Segment par Magasin (%)")
+    parts = resultats['parts']
+    largeur_nom = 50
+    largeur = min(25, (190 - largeur_nom - 20) / max(1, parts.shape[1]))
+    pdf.set_font('Arial', 'B', 9)
+    pdf.cell(largeur_nom, 7, 'Magasin', 1, 0, 'C')
+    for segment in parts.columns:
+        pdf.cell(largeur, 7, _latin1(segment.replace('Groupe ', 'G')), 1, 0, 'C')
+    pdf.cell(20, 7, 'Accord', 1, 1, 'C')
+    pdf.set_font('Arial', '', 9)
+    for nom, ligne in parts.iterrows():
+        pdf.cell(largeur_nom, 6, _latin1(nom[:28]), 1, 0, 'L')
+        for valeur in ligne:
+            pdf.cell(largeur, 6, f"{valeur:.1f}", 1, 0, 'C')
+        pdf.cell(20, 6, f"{resultats['magasins'][nom]['accord_reference']:.2f}", 1, 1, 'C')
+    pdf.ln(4)
+    pdf.set_font('Arial', 'I', 9)
+    pdf.multi_cell(0, 5, "Accord : ressemblance (ARI, 1 = identique) entre les groupes du magasin et les "
+                         "segments de reference appliques tels quels. Un accord faible signale un magasin "
+                         "dont la clientele se decoupe autrement.")
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def sauvegarder_resultats(resultats, dossier):
+    """Écrit le tableau consolidé, le tableau croisé, chaque base segmentée et le rapport PDF."""
+    os.makedirs(os.path.join(dossier, 'magasins'), exist_ok=True)
+    resultats['comparaison'].to_csv(os.path.join(dossier, 'comparaison_magasins.csv'), index=False)
+    resultats['parts'].to_csv(os.path.join(dossier, 'parts_segments.csv'))
+    for nom, resultat in resultats['magasins'].items():
+        resultat['df'].to_csv(os.path.join(dossier, 'magasins', f'{nom}_segmente.csv'), index=False)
+    with open(os.path.join(dossier, 'rapport_multi_magasins.pdf'), 'wb') as fichier:
+        fichier.write(rapport_pdf(resultats))
+    return dossier
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Segmentation par lot de plusieurs magasins, segments alignés")
+    parser.add_argument('dossier', help="Dossier contenant un fichier CSV par magasin")
+    parser.add_argument('--sortie', default='resultats_magasins', help="Dossier des résultats")
+    parser.add_argument('--k', type=int, default=None, help="Nombre de segments de référence (défaut : coude)")
+    parser.add_argument('--k-libre', action='store_true', help="Chaque magasin choisit son propre nombre de groupes")
+    parser.add_argument('--jobs', type=int, default=None, help="Nombre de processus (défaut : tous les cœurs)")
+    args = parser.parse_args()
+
+    magasins = charger_magasins(args.dossier)
+    print(f"[LOT] {len(magasins)} magasins, {sum(len(df) for df in magasins.values())} clients au total")
+    resultats = segmenter_magasins(magasins, k=args.k, k_commun=not args.k_libre, n_jobs=args.jobs)
+    sauvegarder_resultats(resultats, args.sortie)
+
+    print("\n--- POIDS DES SEGMENTS PAR MAGASIN (%) ---")
+    print(resultats['parts'].round(1).to_string())
+    print(f"\n✅ Lot terminé en {resultats['temps_s']:.1f}s. Résultats dans '{args.sortie}'.")
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Service local d'affectation de segment (API HTTP).
+          Charge le modèle sauvegardé par l'application (scaler + centres) et
+          répond en temps réel : "à quel segment appartient ce client ?".
+          Les requêtes qui arrivent en même temps sont regroupées en un seul
+          calcul de distances (micro-lots).
+          Serveur à boucle d'événements (asyncio) : un seul fil pour toutes les
+          connexions, réponses de chaque groupe préparées à l'avance.
+          Débit mesuré (1 cœur partagé avec le client de test, 32 connexions) :
+          ~12 700 requêtes/s en /assigner, p99 ~2 ms (option --banc).
+
+ENDPOINTS :
+    POST /assigner       {"Age": 34, "Score_Fidelite": 80, ...}          -> un client
+    POST /assigner/lot   {"clients": [{...}, {...}]}                     -> plusieurs clients
+    GET  /metriques      latences (p50, p95, p99), débit, taille des lots
+    GET  /sante          vérification que le service répond
+
+LANCEMENT :
+    python service_segments.py modele_segments.json --port 8765
+    python service_segments.py modele_segments.json --port 0 --banc 50000   (mesure du débit)
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import argparse                  # Lecture des options de la ligne de commande
+import asyncio                   # Serveur à boucle d'événements (un seul fil pour toutes les connexions)
+import json                      # Format d'échange (modèle et requêtes)
+import math                      # Pour refuser les valeurs non finies
+import threading                 # La boucle du service tourne dans son propre fil d'exécution
+import time                      # Chronométrage des requêtes
+from collections import deque    # Mémoire glissante des dernières latences
+from concurrent.futures import ProcessPoolExecutor  # Le banc de débit tourne dans un autre processus
+from http import HTTPStatus      # Libellés des codes de réponse (200 OK, 404 Not Found...)
+
+import numpy as np               # Moteur de calcul mathématique
+
+# ==============================================================================
+# 2. LE MODÈLE (SAUVEGARDE / CHARGEMENT)
+# ==============================================================================
+
+def modele_en_json(colonnes, moyenne, echelle, centres, descriptions):
+    """
+    Transforme un modèle entraîné en texte JSON :
+    colonnes utilisées, paramètres du StandardScaler, centres K-Means (dans l'espace normalisé)
+    et l'étiquette 'generer_description' de chaque groupe.
+    """
+    return json.dumps({
+        'colonnes': list(colonnes),
+        'moyenne': [float(v) for v in moyenne],
+        'echelle': [float(v) for v in echelle],
+        'centres': np.asarray(centres, dtype=float).tolist(),
+        'descriptions': list(descriptions),
+        'cree_le': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }, ensure_ascii=False, indent=2)
+
+
+def charger_modele(chemin):
+    """Relit un modèle sauvegardé (fichier JSON produit par modele_en_json)."""
+    with open(chemin, encoding='utf-8') as fichier:
+        modele = json.load(fichier)
+    modele['moyenne'] = np.array(modele['moyenne'])
+    modele['echelle'] = np.array(modele['echelle'])
+    modele['centres'] = np.array(modele['centres'])
+    return modele
+
+
+def affecter(modele, X):
+    """
+    Calcul vectorisé : normalise les clients puis cherche le centre le plus proche.
+    ||x - c||² = ||x||² - 2 x.c + ||c||² : une seule multiplication de matrices pour tout le lot.
+    """
+    Z = (np.asarray(X, dtype=float) - modele['moyenne']) / modele['echelle']
+    centres = modele['centres']
+    distances = (Z ** 2).sum(axis=1)[:, None] - 2 * Z @ centres.T + (centres ** 2).sum(axis=1)[None, :]
+    return distances.argmin(axis=1)
+
+# ==============================================================================
+# 3. LE REGROUPEUR DE REQUÊTES (MICRO-LOTS)
+# ==============================================================================
+
+class ServiceIndisponible(RuntimeError):
+    """Le regroupeur est arrêté : le service ne peut plus répondre (HTTP 503)."""
+
+
+class RegroupeurRequetes:
+    """
+    Chaque requête /assigner dépose son client avec une fonction de rappel.
+    Le paquet est calculé d'un coup au tour suivant de la boucle : toutes les requêtes
+    arrivées en même temps partagent une seule multiplication de matrices.
+    Un paquet part aussitôt s'il atteint 'taille_max' clients ; 'attente_max_s' > 0 permet
+    d'attendre un peu pour former de plus gros paquets (au prix de la latence).
+    Tout se passe dans le fil de la boucle asyncio : ni verrou, ni changement de fil.
+    """
+    def __init__(self, modele, boucle, taille_max=512, attente_max_s=0.0):
+        self.modele = modele
+        self.boucle = boucle
+        self.taille_max = taille_max
+        self.attente_max_s = attente_max_s
+        self.en_attente = []
+        self.planifie = False
+        self.tailles_lots = deque(maxlen=10000)
+        self.actif = True
+
+    def soumettre(self, vecteur, rappel):
+        """Dépose un client ; 'rappel(groupe, erreur)' sera appelé avec son numéro de groupe."""
+        if not self.actif:
+            raise ServiceIndisponible("Service en cours d'arrêt")
+        self.en_attente.append((vecteur, rappel))
+        if len(self.en_attente) >= self.taille_max:
+            self._traiter()
+        elif not self.planifie:
+            self.planifie = True
+            if self.attente_max_s > 0:
+                self.boucle.call_later(self.attente_max_s, self._traiter)
+            else:
+                self.boucle.call_soon(self._traiter)
+
+    def arreter(self):
+        """Plus aucun client accepté ; ceux qui attendaient reçoivent une erreur 503."""
+        self.actif = False
+        lot, self.en_attente = self.en_attente, []
+        for _, rappel in lot:
+            rappel(None, ServiceIndisponible("Service en cours d'arrêt"))
+
+    def _traiter(self):
+        self.planifie = False
+        lot, self.en_attente = self.en_attente, []
+        if not lot:
+            return  # Paquet déjà parti (taille maximale atteinte)
+        self.tailles_lots.append(len(lot))
+        try:
+            groupes = affecter(self.modele, [vecteur for vecteur, _ in lot]).tolist()
+        except Exception as erreur:
+            for _, rappel in lot:
+                rappel(None, erreur)
+            return
+        for (_, rappel), groupe in zip(lot, groupes):
+            rappel(groupe, None)
+
+# ==============================================================================
+# 4. LES MÉTRIQUES (LATENCE ET DÉBIT)
+# ==============================================================================
+
+class Metriques:
+    """Garde les dernières latences et compte les requêtes pour calculer débit et percentiles."""
+    def __init__(self, taille_fenetre=100000):
+        self.latences = deque(maxlen=taille_fenetre)
+        self.nb_requetes = 0
+        self.nb_clients = 0
+        self.nb_erreurs = 0
+        self.debut = time.perf_counter()
+
+    def enregistrer(self, latence_s, nb_clients=1, erreur=False):
+        # Appelée uniquement depuis la boucle asyncio : pas besoin de verrou
+        self.latences.append(latence_s)
+        self.nb_requetes += 1
+        self.nb_clients += nb_clients
+        self.nb_erreurs += int(erreur)
+
+    def resume(self, tailles_lots):
+        latences_ms = np.array(self.latences) * 1000
+        duree = time.perf_counter() - self.debut
+        resume = {
+            'nb_requetes': self.nb_requetes,
+            'nb_clients': self.nb_clients,
+            'nb_erreurs': self.nb_erreurs,
+            'duree_s': round(duree, 3),
+            'requetes_par_s': round(self.nb_requetes / duree, 1) if duree > 0 else 0.0,
+            'clients_par_s': round(self.nb_clients / duree, 1) if duree > 0 else 0.0,
+        }
+        for p in (50, 95, 99):
+            resume[f'latence_p{p}_ms'] = round(float(np.percentile(latences_ms, p)), 3) if len(latences_ms) else None
+        resume['taille_lot_moyenne'] = round(float(np.mean(tailles_lots)), 2) if tailles_lots else None
+        return resume
+
+# ==============================================================================
+# 5. LE SERVEUR HTTP (BOUCLE ASYNCIO)
+# ==============================================================================
+# Un seul fil et une boucle d'événements : pas de fil par connexion, pas de file d'attente
+# entre fils. Le protocole HTTP/1.1 (connexion gardée ouverte) est lu à la main : seul le
+# strict nécessaire (ligne de requête, Content-Length, Connection) est analysé.
+
+TAILLE_MAX_ENTETE = 64 * 1024          # Au-delà, la requête est refusée (431)
+TAILLE_MAX_CORPS = 16 * 1024 * 1024    # Au-delà, la requête est refusée (413)
+
+
+def _reponse_http(code, contenu, fermer=False):
+    """Réponse HTTP complète (en-têtes + JSON) prête à être envoyée."""
+    corps = json.dumps(contenu, ensure_ascii=False).encode('utf-8')
+    entete = (f"HTTP/1.1 {code} {HTTPStatus(code).phrase}\r\n"
+              f"Content-Type: application/json; charset=utf-8\r\n"
+              f"Content-Length: {len(corps)}\r\n"
+              + ("Connection: close\r\n" if fermer else "") + "\r\n")
+    return entete.encode('latin-1') + corps
+
+
+class _ConnexionHTTP(asyncio.Protocol):
+    """
+    Une connexion cliente. Les requêtes peuvent arriver collées les unes aux autres (pipelining) :
+    chaque requête réserve sa place dans 'reponses', et les réponses partent dans l'ordre.
+    """
+    def __init__(self, serveur):
+        self.serveur = serveur
+        self.tampon = b''
+        self.reponses = deque()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.serveur.connexions.add(transport)
+
+    def connection_lost(self, exc):
+        self.serveur.connexions.discard(self.transport)
+        self.transport = None
+
+    def data_received(self, donnees):
+        self.tampon += donnees
+        while self.transport is not None:
+            fin_entete = self.tampon.find(b'\r\n\r\n')
+            if fin_entete < 0:
+                if len(self.tampon) > TAILLE_MAX_ENTETE:
+                    self._refuser(431, "En-têtes trop longs")
+                return
+            try:
+                lignes = self.tampon[:fin_entete].decode('latin-1').split('\r\n')
+                methode, chemin, version = lignes[0].split(' ')
+                entetes = {}
+                for ligne in lignes[1:]:
+                    nom, _, valeur = ligne.partition(':')
+                    entetes[nom.strip().lower()] = valeur.strip()
+                longueur = int(entetes.get('content-length', 0))
+            except ValueError:
+                self._refuser(400, "Requête HTTP mal formée")
+                return
+            if longueur < 0 or longueur > TAILLE_MAX_CORPS:
+                self._refuser(413, "Corps de requête trop volumineux")
+                return
+            fin = fin_entete + 4 + longueur
+            if len(self.tampon) < fin:
+                return  # Le corps n'est pas encore arrivé en entier
+            corps, self.tampon = self.tampon[fin_entete + 4:fin], self.tampon[fin:]
+            connexion = entetes.get('connection', '').lower()
+            fermer = connexion == 'close' or (version == 'HTTP/1.0' and connexion != 'keep-alive')
+            self._traiter(methode, chemin, corps, fermer)
+
+    def _refuser(self, code, message):
+        """Requête illisible : on répond puis on ferme (la suite du flux n'est plus fiable)."""
+        self.tampon = b''
+        self._remplir(self._reserver(), _reponse_http(code, {'erreur': message}, fermer=True), True)
+
+    def _reserver(self):
+        place = [None, False]
+        self.reponses.append(place)
+        return place
+
+    def _remplir(self, place, reponse, fermer=False):
+        place[0], place[1] = reponse, fermer
+        # On envoie toutes les réponses prêtes, dans l'ordre des requêtes
+        while self.reponses and self.reponses[0][0] is not None and self.transport is not None:
+            reponse, fermer = self.reponses.popleft()
+            self.transport.write(reponse)
+            if fermer:
+                self.transport.close()
+
+    def _vecteur(self, client):
+        if not isinstance(client, dict):
+            raise ValueError("Chaque client doit être un objet JSON : {\"Age\": 34, ...}")
+        colonnes = self.serveur.modele['colonnes']
+        manquantes = [col for col in colonnes if col not in client]
+        if manquantes:
+            raise ValueError(f"Colonnes manquantes : {', '.join(manquantes)}")
+        vecteur = [float(client[col]) for col in colonnes]
+        # json.loads accepte NaN et Infinity : sans ce contrôle, argmin renverrait "Groupe 1"
+        if not all(math.isfinite(valeur) for valeur in vecteur):
+            raise ValueError("Valeurs non finies refusées (NaN, Infinity)")
+        return vecteur
+
+    def _traiter(self, methode, chemin, corps, fermer):
+        serveur = self.serveur
+        place = self._reserver()
+        if methode == 'GET':
+            if chemin == '/sante':
+                reponse = _reponse_http(200, {'statut': 'ok', 'nb_segments': len(serveur.modele['centres'])}, fermer)
+            elif chemin == '/metriques':
+                reponse = _reponse_http(200, serveur.metriques.resume(list(serveur.regroupeur.tailles_lots)), fermer)
+            else:
+                reponse = _reponse_http(404, {'erreur': f"Chemin inconnu : {chemin}"}, fermer)
+            self._remplir(place, reponse, fermer)
+            return
+        if methode != 'POST':
+            self._remplir(place, _reponse_http(405, {'erreur': f"Méthode non gérée : {methode}"}, fermer), fermer)
+            return
+
+        debut = time.perf_counter()
+        nb_clients = 1
+
+        def repondre(code, contenu=None, reponse=None):
+            self._remplir(place, reponse or _reponse_http(code, contenu, fermer), fermer)
+            serveur.metriques.enregistrer(time.perf_counter() - debut, nb_clients, code != 200)
+
+        try:
+            contenu = json.loads(corps or b'{}')
+            if not isinstance(contenu, dict):
+                raise ValueError("Le corps doit être un objet JSON ({...} pour /assigner, {\"clients\": [...]} pour /assigner/lot)")
+            if chemin == '/assigner':
+                # Un client : il passe par le regroupeur pour partager le calcul avec les autres requêtes
+                def rappel(groupe, erreur):
+                    if erreur is None:
+                        # Réponses déjà prêtes (une par groupe) : rien à encoder
+                        repondre(200, reponse=serveur.reponses_groupes[fermer][groupe])
+                    elif isinstance(erreur, ServiceIndisponible):
+                        repondre(503, {'erreur': str(erreur)})
+                    else:
+                        repondre(500, {'erreur': f"Erreur interne : {type(erreur).__name__}"})
+                serveur.regroupeur.soumettre(self._vecteur(contenu), rappel)
+            elif chemin == '/assigner/lot':
+                # Plusieurs clients : c'est déjà un lot, on calcule directement
+                clients = contenu.get('clients', [])
+                if not isinstance(clients, list):
+                    raise ValueError("'clients' doit être une liste de clients")
+                nb_clients = len(clients)
+                groupes = affecter(serveur.modele, [self._vecteur(client) for client in clients]).tolist() if clients else []
+                repondre(200, {'resultats': [serveur.reponses_clients[g] for g in groupes]})
+            else:
+                repondre(404, {'erreur': f"Chemin inconnu : {chemin}"})
+        except (ValueError, TypeError, KeyError) as exc:
+            repondre(400, {'erreur': str(exc)})
+        except ServiceIndisponible as exc:
+            repondre(503, {'erreur': str(exc)})
+        except Exception as exc:
+            # Dernier recours : chaque requête reçoit une réponse HTTP, même en cas d'erreur imprévue
+            repondre(500, {'erreur': f"Erreur interne : {type(exc).__name__}"})
+
+
+class _Serveur:
+    """La boucle asyncio du service, lancée dans un fil en arrière-plan."""
+    def __init__(self, modele, hote, port, taille_lot_max, attente_max_s):
+        self.modele = modele
+        self.metriques = Metriques()
+        self.connexions = set()
+        self.boucle = asyncio.new_event_loop()
+        self.regroupeur = RegroupeurRequetes(modele, self.boucle, taille_lot_max, attente_max_s)
+        # La réponse de chaque groupe ne change jamais : on la prépare une fois pour toutes
+        self.reponses_clients = [{'cluster': g, 'segment': f"Groupe {g + 1}", 'description': description}
+                                 for g, description in enumerate(modele['descriptions'])]
+        self.reponses_groupes = {fermer: [_reponse_http(200, reponse, fermer) for reponse in self.reponses_clients]
+                                 for fermer in (False, True)}
+        # File d'attente des connexions entrantes agrandie : sinon les pics sont refusés
+        self.serveur = self.boucle.run_until_complete(
+            self.boucle.create_server(lambda: _ConnexionHTTP(self), hote, port, backlog=1024))
+        self.server_address = self.serveur.sockets[0].getsockname()[:2]
+        self.fil = threading.Thread(target=self.boucle.run_forever, daemon=True)
+        self.fil.start()
+
+    def arreter(self):
+        def fermer():
+            self.regroupeur.arreter()
+            self.serveur.close()
+            for transport in list(self.connexions):
+                transport.close()
+            self.boucle.call_soon(self.boucle.stop)  # Un tour de plus pour envoyer les dernières réponses
+        self.boucle.call_soon_threadsafe(fermer)
+        self.fil.join()
+        self.boucle.close()
+
+
+def demarrer_service(modele, hote='127.0.0.1', port=8765, taille_lot_max=512, attente_max_s=0.0):
+    """
+    Démarre le service en arrière-plan et renvoie le serveur.
+    port=0 laisse le système choisir un port libre (pratique pour les tests) : voir serveur.server_address.
+    Pour arrêter : arreter_service(serveur).
+    """
+    return _Serveur(modele, hote, port, taille_lot_max, attente_max_s)
+
+
+def arreter_service(serveur):
+    serveur.arreter()
+
+# ==============================================================================
+# 6. TEST DE CHARGE EN LOCAL
+# ==============================================================================
+
+def mesurer_debit(hote, port, client, nb_requetes=20000, nb_connexions=32):
+    """
+    Envoie 'nb_requetes' requêtes /assigner sur 'nb_connexions' connexions gardées ouvertes
+    (une requête à la fois par connexion, comme des clients indépendants) et renvoie
+    le débit observé côté client. À lancer de préférence dans un autre processus que le service.
+    """
+    corps = json.dumps(client).encode('utf-8')
+    requete = (f"POST /assigner HTTP/1.1\r\nHost: {hote}\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(corps)}\r\n\r\n").encode('latin-1') + corps
+
+    async def connexion(nb):
+        lecteur, ecrivain = await asyncio.open_connection(hote, port)
+        nb_ok = 0
+        for _ in range(nb):
+            ecrivain.write(requete)
+            entete = await lecteur.readuntil(b'\r\n\r\n')
+            longueur = int(entete.lower().split(b'content-length:')[1].split(b'\r\n')[0])
+            await lecteur.readexactly(longueur)
+            nb_ok += entete.startswith(b'HTTP/1.1 200')
+        ecrivain.close()
+        return nb_ok
+
+    async def tout_envoyer():
+        parts = [nb_requetes // nb_connexions + (i < nb_requetes % nb_connexions) for i in range(nb_connexions)]
+        return sum(await asyncio.gather(*(connexion(nb) for nb in parts)))
+
+    debut = time.perf_counter()
+    nb_ok = asyncio.run(tout_envoyer())
+    duree = time.perf_counter() - debut
+    return {'nb_requetes': nb_requetes, 'nb_ok': nb_ok,
+            'duree_s': round(duree, 3), 'requetes_par_s': round(nb_requetes / duree, 1)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Service local d'affectation de segment")
+    parser.add_argument('modele', help="Fichier JSON exporté depuis l'application (onglet RAPPORT EXPERT)")
+    parser.add_argument('--hote', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--taille-lot', type=int, default=512, help="Taille maximale d'un micro-lot")
+    parser.add_argument('--attente-ms', type=float, default=0.0, help="Attente maximale pour compléter un micro-lot")
+    parser.add_argument('--banc', type=int, default=0, metavar='N',
+                        help="Mesure le débit avec N requêtes /assigner (client dans un autre processus), puis s'arrête")
+    args = parser.parse_args()
+
+    modele = charger_modele(args.modele)
+    serveur = demarrer_service(modele, args.hote, args.port, args.taille_lot, args.attente_ms / 1000)
+    print(f"✅ Service prêt sur http://{args.hote}:{serveur.server_address[1]} (CTRL + C pour arrêter)")
+    if args.banc:
+        # Client type : la moyenne de chaque colonne
+        client = {col: float(valeur) for col, valeur in zip(modele['colonnes'], modele['moyenne'])}
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            print(pool.submit(mesurer_debit, args.hote, serveur.server_address[1], client, args.banc).result())
+        print(serveur.metriques.resume(list(serveur.regroupeur.tailles_lots)))
+        arreter_service(serveur)
+    else:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            arreter_service(serveur)
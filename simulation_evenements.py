@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Simulation des journaux bruts (commandes + sessions web) et
+          agrégation en flux vers la table clients à 12 colonnes.
+          Les journaux respectent les mêmes règles sociologiques que
+          'CREATION DATASET.py' : ré-agrégés, ils redonnent la table d'origine
+          à l'arrondi près. Les colonnes issues d'une moyenne (Panier, Temps de
+          session...) sont exactes. Les deux taux (Sensibilite_Promo et
+          Taux_Abandon_Panier) sont des comptes d'événements entiers divisés par
+          le nombre de commandes ou de sessions : ils retombent au plus près
+          (écart <= 1 / (2 x nb_commandes), soit 0.04 au pire pour 12 commandes ;
+          un taux d'abandon au-delà de 0.9 est plafonné à 0.9).
+          Nombre_Pages_Vues peut différer d'une page (arrondi de la durée).
+          Tout est écrit et relu par blocs : la mémoire reste bornée, même
+          avec des milliards d'événements.
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import glob                      # Pour retrouver les fichiers de chaque bloc
+import os                        # Pour créer les dossiers de sortie
+import time                      # Pour chronométrer la génération et l'agrégation
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+
+from noyau_segmentation import FEATURES_TOUTES
+
+# Fenêtre d'observation des journaux : 12 mois (365 jours)
+NB_MOIS = 12
+JOUR_FIN = 365
+
+# ==============================================================================
+# 2. LES PROFILS (MÊMES RÈGLES QUE 'CREATION DATASET.py')
+# ==============================================================================
+
+def generer_profils(nb_clients, rng):
+    """
+    Reproduit les règles métier du générateur (Revenu lié à l'âge, Fréquence liée
+    à la fidélité...) avec un générateur aléatoire local, pour pouvoir avancer bloc par bloc.
+    """
+    df = pd.DataFrame()
+    df['Age'] = rng.integers(18, 75, nb_clients)
+    df['Revenu_Mensuel_Estime'] = np.abs(rng.normal(3000, 1000, nb_clients) + df['Age'] * 40)
+    df['Score_Fidelite'] = rng.integers(0, 100, nb_clients)
+    df['Sensibilite_Promo'] = np.clip(1 - (df['Revenu_Mensuel_Estime'] / 8000) + rng.normal(0, 0.2, nb_clients), 0, 1)
+    df['Panier_Moyen'] = np.abs((df['Revenu_Mensuel_Estime'] * 0.15) + rng.normal(0, 100, nb_clients))
+    df['Frequence_Achat_Mois'] = np.clip((df['Score_Fidelite'] / 20) + rng.normal(0, 1, nb_clients), 1, 10).astype(int)
+    df['Temps_Session_Sec'] = np.abs(np.where(df['Age'] < 30,
+                                              rng.normal(180, 60, nb_clients),
+                                              rng.normal(400, 120, nb_clients)))
+    proba_mobile = np.where(df['Age'] < 40, 0.8, 0.4)
+    df['Score_Tech_Device'] = np.where(rng.random(nb_clients) < proba_mobile, 0.0, 1.0)
+    df['Taux_Abandon_Panier'] = np.clip((df['Panier_Moyen'] / 2000) + rng.normal(0, 0.1, nb_clients), 0, 1)
+    df['Note_Satisfaction'] = rng.choice([1, 2, 3, 4, 5], nb_clients, p=[0.05, 0.1, 0.2, 0.4, 0.25])
+    df['Nombre_Pages_Vues'] = (df['Temps_Session_Sec'] / 30).astype(int)
+    df['Jours_Depuis_Dernier_Achat'] = (100 - df['Score_Fidelite']) * 3 + rng.integers(0, 20, nb_clients)
+    return df.round(2)
+
+# ==============================================================================
+# 3. DES PROFILS AUX ÉVÉNEMENTS
+# ==============================================================================
+
+def _bruit_moyenne_exacte(client, moyenne_cible, rng, dispersion):
+    """
+    Tire une valeur par événement autour de la moyenne du client, puis corrige
+    chaque client pour que la moyenne de ses événements retombe exactement sur sa valeur.
+    """
+    valeurs = moyenne_cible[client] * rng.lognormal(0, dispersion, len(client))
+    moyennes = np.bincount(client, weights=valeurs) / np.bincount(client)
+    return valeurs * (moyenne_cible / np.where(moyennes > 0, moyennes, 1))[client]
+
+
+def generer_evenements(profils, rng, id_depart=0):
+    """
+    Transforme un bloc de profils en trois tables :
+      clients   -> id_client + attributs CRM (Age, Revenu, Fidélité)
+      commandes -> une ligne par commande (jour, montant, code promo, note)
+      sessions  -> une ligne par visite (jour, durée, pages, terminal, panier abandonné)
+    """
+    n = len(profils)
+    ids = np.arange(id_depart, id_depart + n, dtype=np.int64)
+
+    clients = pd.DataFrame({'id_client': ids})
+    for col in ['Age', 'Revenu_Mensuel_Estime', 'Score_Fidelite']:
+        clients[col] = profils[col].to_numpy()
+
+    # --- COMMANDES : Fréquence x 12 mois, la dernière tombe pile sur la récence ---
+    nb_commandes = profils['Frequence_Achat_Mois'].to_numpy().astype(int) * NB_MOIS
+    client_cmd = np.repeat(np.arange(n), nb_commandes)
+    dernier_jour = JOUR_FIN - profils['Jours_Depuis_Dernier_Achat'].to_numpy().astype(int)
+    jours = (rng.random(len(client_cmd)) * (dernier_jour[client_cmd] + 1)).astype(np.int32)
+    premiere = np.r_[0, np.cumsum(nb_commandes)[:-1]]  # Position de la 1ère commande de chaque client
+    jours[premiere] = dernier_jour
+    montants = _bruit_moyenne_exacte(client_cmd, profils['Panier_Moyen'].to_numpy(), rng, 0.3)
+    # Codes promo : chaque client en reçoit exactement round(Sensibilite_Promo x nb_commandes),
+    # placés au hasard parmi ses commandes (même idée que _bruit_moyenne_exacte : le total est imposé)
+    nb_promo = np.round(profils['Sensibilite_Promo'].to_numpy() * nb_commandes).astype(int)
+    melange = np.lexsort((rng.random(len(client_cmd)), client_cmd))
+    rang_cmd = np.arange(len(client_cmd)) - premiere[client_cmd]
+    promo = np.zeros(len(client_cmd), dtype=bool)
+    promo[melange] = rang_cmd < nb_promo[client_cmd]
+    commandes = pd.DataFrame({
+        'id_client': ids[client_cmd],
+        'jour': jours,
+        'montant': montants.round(2),
+        'code_promo': promo.astype(np.int8),
+        'note': profils['Note_Satisfaction'].to_numpy()[client_cmd].astype(np.int8),
+    })
+
+    # --- SESSIONS : chaque commande vient d'une session, on ajoute les paniers abandonnés ---
+    abandon = np.clip(profils['Taux_Abandon_Panier'].to_numpy(), 0, 0.9)
+    nb_abandons = np.round(nb_commandes * abandon / (1 - abandon)).astype(int)
+    nb_sessions = nb_commandes + nb_abandons
+    client_ses = np.repeat(np.arange(n), nb_sessions)
+    rang = np.arange(len(client_ses)) - np.repeat(np.r_[0, np.cumsum(nb_sessions)[:-1]], nb_sessions)
+    durees = _bruit_moyenne_exacte(client_ses, profils['Temps_Session_Sec'].to_numpy(), rng, 0.4)
+    sessions = pd.DataFrame({
+        'id_client': ids[client_ses],
+        'jour': (rng.random(len(client_ses)) * JOUR_FIN).astype(np.int32),
+        'duree_sec': durees.round(2),
+        'pages_vues': (durees / 30).astype(np.int32),
+        'desktop': profils['Score_Tech_Device'].to_numpy()[client_ses].astype(np.int8),
+        'panier_abandonne': (rang >= nb_commandes[client_ses]).astype(np.int8),
+    })
+    return clients, commandes, sessions
+
+# ==============================================================================
+# 4. ÉCRITURE DES JOURNAUX PAR BLOCS
+# ==============================================================================
+
+def _ecrire(df, dossier, table, numero, format):
+    chemin = os.path.join(dossier, table, f"part-{numero:05d}.{format}")
+    if format == 'parquet':
+        df.to_parquet(chemin, index=False)
+    else:
+        df.to_csv(chemin, index=False)
+
+
+def simuler_journaux(dossier, nb_clients=None, profils=None, taille_bloc=100000, format='csv', graine=42):
+    """
+    Écrit les journaux bloc par bloc dans 'dossier/clients', 'dossier/commandes', 'dossier/sessions'.
+    - Soit on fournit des profils existants (ex : la table de 'CREATION DATASET.py'),
+    - Soit on donne nb_clients et les profils sont générés au fil de l'eau (aucune limite de volume).
+    Retourne le nombre de lignes écrites par table.
+    """
+    if format not in ('csv', 'parquet'):
+        raise ValueError(f"Format inconnu : '{format}' (choix possibles : csv, parquet)")
+    if profils is None and nb_clients is None:
+        raise ValueError("Il faut fournir 'profils' ou 'nb_clients'.")
+    total = len(profils) if profils is not None else nb_clients
+
+    for table in ('clients', 'commandes', 'sessions'):
+        os.makedirs(os.path.join(dossier, table), exist_ok=True)
+
+    rng = np.random.default_rng(graine)
+    compteurs = {'clients': 0, 'commandes': 0, 'sessions': 0}
+    for numero, debut in enumerate(range(0, total, taille_bloc)):
+        fin = min(debut + taille_bloc, total)
+        if profils is not None:
+            bloc = profils.iloc[debut:fin].reset_index(drop=True)
+        else:
+            bloc = generer_profils(fin - debut, rng)
+        tables = dict(zip(('clients', 'commandes', 'sessions'), generer_evenements(bloc, rng, id_depart=debut)))
+        for table, df in tables.items():
+            _ecrire(df, dossier, table, numero, format)
+            compteurs[table] += len(df)
+    return compteurs
+
+# ==============================================================================
+# 5. AGRÉGATION EN FLUX (JOURNAUX -> TABLE À 12 COLONNES)
+# ==============================================================================
+
+def _lire_par_lots(dossier, table, colonnes, taille_lot):
+    """Relit une table lot par lot, sans jamais la charger entièrement."""
+    for chemin in sorted(glob.glob(os.path.join(dossier, table, 'part-*'))):
+        if chemin.endswith('.parquet'):
+            import pyarrow.parquet as pq  # Dépendance optionnelle, seulement pour le format Parquet
+            for lot in pq.ParquetFile(chemin).iter_batches(batch_size=taille_lot, columns=colonnes):
+                yield lot.to_pandas()
+        else:
+            yield from pd.read_csv(chemin, usecols=colonnes, chunksize=taille_lot)
+
+
+def _positions_clients(ids_tries, ids):
+    """
+    Traduit les id_client d'un lot en positions dans la table clients (triée par id).
+    Fonctionne avec n'importe quels identifiants (grands, négatifs, non contigus : ex. les
+    empreintes 64 bits de base_segments). Retourne (positions, masque des id connus) :
+    les événements d'un client absent de la table clients sont ignorés.
+    """
+    positions = np.searchsorted(ids_tries, ids)
+    positions = np.minimum(positions, len(ids_tries) - 1)
+    return positions, ids_tries[positions] == ids
+
+
+def agreger_journaux(dossier, taille_lot=1000000):
+    """
+    Reconstruit la table clients à 12 colonnes à partir des journaux.
+    Chaque lot est réduit par client avec np.bincount (sommes, comptes) et np.maximum.at (dernier achat) :
+    la mémoire utilisée ne dépend que du nombre de clients, jamais du nombre d'événements.
+    Les lignes d'un même client peuvent être réparties dans n'importe quels lots.
+    Les id_client sont d'abord traduits en positions (np.searchsorted) : ils peuvent être quelconques.
+    """
+    clients = pd.concat(_lire_par_lots(dossier, 'clients', None, taille_lot), ignore_index=True)
+    clients = clients.drop_duplicates('id_client').sort_values('id_client').reset_index(drop=True)
+    ids_tries = clients['id_client'].to_numpy()
+    n = len(clients)
+
+    # Accumulateurs : un compartiment par client
+    cmd = {nom: np.zeros(n) for nom in ('nb', 'montant', 'promo', 'note')}
+    dernier_jour = np.full(n, -1, dtype=np.int64)
+    for lot in _lire_par_lots(dossier, 'commandes', ['id_client', 'jour', 'montant', 'code_promo', 'note'], taille_lot):
+        positions, connus = _positions_clients(ids_tries, lot['id_client'].to_numpy())
+        lot, positions = lot[connus], positions[connus]
+        cmd['nb'] += np.bincount(positions, minlength=n)
+        cmd['montant'] += np.bincount(positions, weights=lot['montant'].to_numpy(), minlength=n)
+        cmd['promo'] += np.bincount(positions, weights=lot['code_promo'].to_numpy(), minlength=n)
+        cmd['note'] += np.bincount(positions, weights=lot['note'].to_numpy(), minlength=n)
+        np.maximum.at(dernier_jour, positions, lot['jour'].to_numpy())
+
+    ses = {nom: np.zeros(n) for nom in ('nb', 'duree', 'desktop', 'abandon')}
+    for lot in _lire_par_lots(dossier, 'sessions', ['id_client', 'duree_sec', 'desktop', 'panier_abandonne'], taille_lot):
+        positions, connus = _positions_clients(ids_tries, lot['id_client'].to_numpy())
+        lot, positions = lot[connus], positions[connus]
+        ses['nb'] += np.bincount(positions, minlength=n)
+        ses['duree'] += np.bincount(positions, weights=lot['duree_sec'].to_numpy(), minlength=n)
+        ses['desktop'] += np.bincount(positions, weights=lot['desktop'].to_numpy(), minlength=n)
+        ses['abandon'] += np.bincount(positions, weights=lot['panier_abandonne'].to_numpy(), minlength=n)
+
+    # Un compartiment par client de la table clients, dans l'ordre des id
+    nb_cmd = np.maximum(cmd['nb'], 1)
+    nb_ses = np.maximum(ses['nb'], 1)
+    temps_session = ses['duree'] / nb_ses
+
+    df = pd.DataFrame({
+        'Age': clients['Age'].to_numpy(),
+        'Revenu_Mensuel_Estime': clients['Revenu_Mensuel_Estime'].to_numpy(),
+        'Score_Fidelite': clients['Score_Fidelite'].to_numpy(),
+        'Sensibilite_Promo': cmd['promo'] / nb_cmd,
+        'Panier_Moyen': cmd['montant'] / nb_cmd,
+        'Frequence_Achat_Mois': np.clip(np.round(cmd['nb'] / NB_MOIS), 1, 10).astype(int),
+        'Temps_Session_Sec': temps_session,
+        'Score_Tech_Device': ses['desktop'] / nb_ses,
+        'Taux_Abandon_Panier': ses['abandon'] / nb_ses,
+        'Note_Satisfaction': np.round(cmd['note'] / nb_cmd).astype(int),
+        'Nombre_Pages_Vues': (temps_session / 30).astype(int),
+        'Jours_Depuis_Dernier_Achat': JOUR_FIN - dernier_jour,
+    }, index=pd.Index(ids_tries, name='id_client'))
+    return df[FEATURES_TOUTES].round(2)
+
+# ==============================================================================
+# 6. BANC D'ESSAI (GÉNÉRATION + INGESTION)
+# ==============================================================================
+if __name__ == '__main__':
+    dossier = 'journaux_evenements'
+    nb_clients = 50000
+
+    print(f"[SIMULATION] Génération des journaux pour {nb_clients:,} clients...".replace(',', ' '))
+    debut = time.perf_counter()
+    compteurs = simuler_journaux(dossier, nb_clients=nb_clients)
+    duree = time.perf_counter() - debut
+    nb_evenements = compteurs['commandes'] + compteurs['sessions']
+    print(f"   ► {nb_evenements:,} événements écrits en {duree:.1f}s".replace(',', ' '))
+
+    print("[INGESTION] Agrégation en flux vers la table à 12 colonnes...")
+    debut = time.perf_counter()
+    df = agreger_journaux(dossier)
+    duree = time.perf_counter() - debut
+    print(f"   ► {len(df):,} clients reconstruits en {duree:.1f}s ({nb_evenements / duree:,.0f} événements/s)".replace(',', ' '))
+
+    print("\n--- APERÇU ÉCHANTILLON (5 PREMIÈRES LIGNES) ---")
+    print(df.head().to_string())
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+PROJET  : AUDIENCE ARCHITECT
+DESC    : Test de stabilité de la segmentation (Bootstrap).
+          On ré-entraîne le K-Means retenu sur de nombreux tirages aléatoires
+          de la base, puis on vérifie que chaque groupe retrouve les mêmes
+          clients. Un groupe stable est un vrai segment, pas un hasard de la
+          graine (random_state=42).
+=============================================================================
+"""
+
+# --- 1. IMPORTATION DES LIBRAIRIES ---
+import os                        # Pour connaître le nombre de processeurs
+import time                      # Pour respecter le budget de temps
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait  # Calcul sur plusieurs processeurs
+
+import numpy as np               # Moteur de calcul mathématique
+import pandas as pd              # Gestionnaire de tableaux
+from scipy.optimize import linear_sum_assignment  # Appariement optimal des centres (méthode hongroise)
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from threadpoolctl import threadpool_limits  # Pour éviter que chaque processus réclame tous les cœurs
+
+# Seuils d'interprétation de Hennig (2007) pour le Jaccard Bootstrap moyen d'un segment :
+# au-dessus de 0.85 très stable, de 0.75 stable, de 0.60 un motif réel mais flou, en dessous instable.
+# Ils portent sur le Jaccard par segment (et non sur l'ARI) : le score global est donc la moyenne des Jaccard.
+SEUILS_STABILITE = [(0.85, "TRÈS STABLE"), (0.75, "STABLE"), (0.60, "FRAGILE")]
+# Verdict quand aucun tirage n'a pu être fait dans le budget (le score vaut alors None)
+NON_MESURE = "NON MESURÉ"
+
+# ==============================================================================
+# 2. LES OUTILS DE COMPARAISON
+# ==============================================================================
+
+def apparier_centres(centres_ref, centres_tirage):
+    """
+    Trouve quel groupe du tirage correspond à quel groupe de référence
+    (appariement qui minimise la distance totale entre centres).
+    Retourne un tableau : correspondance[groupe_tirage] = groupe_reference.
+    Si le tirage a plus de groupes que la référence, les groupes en trop
+    rejoignent le groupe de référence le plus proche.
+    """
+    distances = ((centres_tirage[:, None, :] - centres_ref[None, :, :]) ** 2).sum(axis=2)
+    lignes, colonnes = linear_sum_assignment(distances)
+    correspondance = distances.argmin(axis=1)
+    correspondance[lignes] = colonnes
+    return correspondance
+
+
+def jaccard_par_segment(labels_ref, labels_tirage, k):
+    """
+    Pour chaque groupe : part des clients communs entre la référence et le tirage
+    (intersection / union). 1 = le groupe retrouve exactement les mêmes clients.
+    """
+    scores = np.full(k, np.nan)
+    for j in range(k):
+        a, b = labels_ref == j, labels_tirage == j
+        union = np.count_nonzero(a | b)
+        if union:
+            scores[j] = np.count_nonzero(a & b) / union
+    return scores
+
+
+def _evaluer_tirage(X_tirage, labels_ref, centres_ref, k, graine, n_init):
+    """
+    Un tirage : on ré-entraîne le modèle, on renomme ses groupes comme la référence,
+    puis on mesure l'accord (ARI global + Jaccard par groupe).
+    Exécuté dans un processus séparé : on ne reçoit que l'échantillon, jamais la base entière.
+    """
+    with threadpool_limits(limits=1):
+        km = KMeans(n_clusters=k, random_state=graine, n_init=n_init).fit(X_tirage)
+    labels_tirage = apparier_centres(centres_ref, km.cluster_centers_)[km.labels_]
+    return adjusted_rand_score(labels_ref, labels_tirage), jaccard_par_segment(labels_ref, labels_tirage, k)
+
+# ==============================================================================
+# 3. LE TEST DE STABILITÉ
+# ==============================================================================
+
+def analyser_stabilite(df_scaled, labels_ref, centres_ref, n_tirages=50, mode='bootstrap',
+                       taille_max=50000, fraction=0.8, budget_s=30.0, n_jobs=None,
+                       n_init=10, random_state=42):
+    """
+    Ré-entraîne la configuration retenue sur plusieurs tirages et mesure sa stabilité.
+
+    - mode : 'bootstrap' (tirage avec remise) ou 'subsample' (sous-échantillon sans remise)
+    - taille_max : taille maximale d'un tirage (garde le coût fixe même avec des millions de lignes)
+    - fraction : part de la base tirée en mode 'subsample'
+    - budget_s : temps maximum. Plus aucun tirage n'est lancé une fois le budget dépassé
+      (y compris la première vague : budget_s=0 ne lance aucun tirage).
+    - n_jobs : nombre de processus (None = tous les cœurs)
+
+    Retourne un dictionnaire avec le score global (moyenne des Jaccard moyens des segments),
+    son interprétation (seuils de Hennig), l'ARI moyen (accord global, à titre indicatif),
+    le détail par segment (Jaccard moyen, minimum et verdict) et le nombre de tirages réalisés.
+    Si aucun tirage ne tient dans le budget : score None, interprétation NON_MESURE
+    et Jaccard vides (NaN). On ne présente jamais un score qui n'a pas été mesuré.
+    """
+    if mode not in ('bootstrap', 'subsample'):
+        raise ValueError(f"Mode inconnu : '{mode}' (choix possibles : bootstrap, subsample)")
+
+    X = np.asarray(df_scaled, dtype=float)
+    labels_ref = np.asarray(labels_ref)
+    centres_ref = np.asarray(centres_ref, dtype=float)
+    k, n = len(centres_ref), len(X)
+
+    # Un seul groupe : il n'y a rien à tester, la segmentation est forcément stable
+    if k < 2:
+        return {'score': 1.0, 'interpretation': interpreter_stabilite(1.0), 'ari': [], 'ari_moyen': 1.0,
+                'segments': pd.DataFrame({'jaccard_moyen': [1.0], 'jaccard_min': [1.0],
+                                          'verdict': [interpreter_stabilite(1.0)]}),
+                'n_tirages': 0, 'temps_s': 0.0}
+
+    # Taille d'un tirage : bornée pour que le coût ne dépende pas de la taille de la base
+    if mode == 'bootstrap':
+        taille = min(n, taille_max)
+    else:
+        taille = min(int(n * fraction), taille_max)
+
+    generateur = np.random.default_rng(random_state)
+    debut = time.perf_counter()
+    scores_ari, scores_jaccard = [], []
+    if budget_s <= 0 or n_tirages < 1:
+        return _resultat_non_mesure(k, debut)
+
+    def lancer(pool):
+        idx = generateur.choice(n, size=taille, replace=(mode == 'bootstrap'))
+        graine = int(generateur.integers(0, 2**31 - 1))
+        return pool.submit(_evaluer_tirage, X[idx], labels_ref[idx], centres_ref, k, graine, n_init)
+
+    nb_workers = n_jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=nb_workers) as pool:
+        en_cours, lances = set(), 0
+        # On garde juste assez de tirages en vol pour occuper les processus (dans la limite du budget)
+        while lances < n_tirages and len(en_cours) < nb_workers and time.perf_counter() - debut < budget_s:
+            en_cours.add(lancer(pool))
+            lances += 1
+        while en_cours:
+            termines, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in termines:
+                ari, jaccard = futur.result()
+                scores_ari.append(ari)
+                scores_jaccard.append(jaccard)
+            # Budget dépassé : on laisse finir les tirages en vol, sans en lancer d'autres
+            while lances < n_tirages and len(en_cours) < nb_workers and time.perf_counter() - debut < budget_s:
+                en_cours.add(lancer(pool))
+                lances += 1
+
+    if not scores_ari:
+        return _resultat_non_mesure(k, debut)
+    jaccard = np.vstack(scores_jaccard)
+    jaccard_moyen = np.nanmean(jaccard, axis=0)
+    # Score global : Jaccard moyen des segments (l'échelle sur laquelle les seuils de Hennig sont définis)
+    score = float(np.nanmean(jaccard_moyen))
+    return {
+        'score': score,
+        'interpretation': interpreter_stabilite(score),
+        'ari': scores_ari,
+        'ari_moyen': float(np.mean(scores_ari)),
+        'segments': pd.DataFrame({
+            'jaccard_moyen': jaccard_moyen,
+            'jaccard_min': np.nanmin(jaccard, axis=0),
+            'verdict': [interpreter_stabilite(j) for j in jaccard_moyen],
+        }),
+        'n_tirages': len(scores_ari),
+        'temps_s': time.perf_counter() - debut,
+    }
+
+
+def _resultat_non_mesure(k, debut):
+    """Résultat quand aucun tirage n'a pu être fait : pas de score (et surtout pas un faux score)."""
+    return {'score': None, 'interpretation': NON_MESURE, 'ari': [], 'ari_moyen': None,
+            'segments': pd.DataFrame({'jaccard_moyen': np.full(k, np.nan), 'jaccard_min': np.full(k, np.nan),
+                                      'verdict': NON_MESURE}),
+            'n_tirages': 0, 'temps_s': time.perf_counter() - debut}
+
+
+def interpreter_stabilite(score):
+    """Traduit un Jaccard Bootstrap moyen (0 à 1) en verdict lisible (seuils de Hennig)."""
+    for seuil, verdict in SEUILS_STABILITE:
+        if score >= seuil:
+            return verdict
+    return "INSTABLE"